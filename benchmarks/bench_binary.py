@@ -0,0 +1,92 @@
+"""Compare the `Json` writer with the `Binary` writer (in each of its
+encodings) on long note sequences: time to write, time to load back into
+arrays, and size of the output.
+
+Usage: python benchmarks/bench_binary.py [NUM_NOTES ...]
+"""
+
+from __future__ import print_function
+
+import argparse
+import io
+import json
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from gazouilli.notes import NoteSequence  # noqa: E402
+from gazouilli.writers import Binary, Json  # noqa: E402
+from gazouilli.writers.binary import loads  # noqa: E402
+
+
+HOP_SECONDS = 4096 / 44100.0
+
+
+def load_json(data):
+    pairs = json.loads(data)
+    return NoteSequence.from_pairs(pairs)
+
+
+def bench(num_notes, seed=0, repeat=3):
+    rng = np.random.RandomState(seed)
+    notes = rng.randint(0, 128, num_notes)
+    durations = rng.geometric(0.2, num_notes) * HOP_SECONDS
+    pairs = NoteSequence(notes, durations)
+
+    outputs = [
+        ('json', Json, {}, load_json),
+    ] + [
+        ('binary {}{}'.format(encoding, '+zlib' if compression else ''),
+         Binary, {'durations': encoding, 'compression': compression}, loads)
+        for encoding in ('float32', 'varint')
+        for compression in (None, 'zlib')
+    ]
+
+    for name, writer, options, load in outputs:
+        def write():
+            # The JSON writer writes native strings
+            out = (io.StringIO() if writer is Json and str is not bytes
+                   else io.BytesIO())
+            writer(pairs, **options).write(out)
+            return out.getvalue()
+
+        data = write()
+        loaded = load(data)
+        if writer is Binary:
+            loaded = loaded[0]
+        assert np.array_equal(loaded.notes, pairs.notes), 'notes differ'
+        assert np.allclose(loaded.durations, pairs.durations), \
+            'durations differ'
+
+        t_write = min(timeit.repeat(write, number=1, repeat=repeat))
+        t_load = min(timeit.repeat(lambda: load(data), number=1,
+                                   repeat=repeat))
+        print('{:>9} notes  {:<20} write {:8.2f} ms  load {:8.2f} ms  '
+              '{:6.2f} bytes/note'.format(
+                  num_notes, name, t_write * 1e3, t_load * 1e3,
+                  len(data) / float(num_notes)))
+
+
+def get_arguments():
+    parser = argparse.ArgumentParser(
+        description='Compare the Json and Binary writers.')
+    parser.add_argument(
+        'sizes', nargs='*', type=int, default=[10**5, 10**6],
+        metavar='NUM_NOTES',
+        help='Numbers of notes written.'
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = get_arguments()
+    for num_notes in args.sizes:
+        bench(num_notes)
+
+
+if __name__ == '__main__':
+    main()
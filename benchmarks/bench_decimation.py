@@ -0,0 +1,73 @@
+"""Compare the cost of `WaveReader.get_frequencies` with and without
+decimation, and how closely the notes found with decimation match those found
+at the full sample rate, on each signal of the synthetic corpus.
+
+Usage: python benchmarks/bench_decimation.py [SECONDS_OF_AUDIO [FACTOR ...]]
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from gazouilli.gazouilli import WaveReader  # noqa: E402
+from gazouilli.utils import quantize  # noqa: E402
+from synth import FRAMERATE, SIGNALS  # noqa: E402
+
+
+def bench(signal, seconds, factors, repeat=3):
+    data = SIGNALS[signal](seconds, FRAMERATE)
+    nframes = len(data)
+
+    full = WaveReader()
+    expected = quantize(full.get_frequencies(data, nframes, FRAMERATE))
+    reference = min(timeit.repeat(
+        lambda: full.get_frequencies(data, nframes, FRAMERATE),
+        number=1, repeat=repeat))
+    print('{:>7} {:>6}s  full rate {:8.3f} ms/s'.format(
+        signal, seconds, reference / seconds * 1e3))
+
+    for factor in factors:
+        reader = WaveReader(decimation=factor)
+        notes = quantize(reader.get_frequencies(data, nframes, FRAMERATE))
+        t = min(timeit.repeat(
+            lambda: reader.get_frequencies(data, nframes, FRAMERATE),
+            number=1, repeat=repeat))
+
+        # Notes that differ by an octave are counted separately, since they
+        # are the usual error of the argmax pitch estimate
+        same = np.mean(notes == expected)
+        octave = np.mean(np.abs(notes.astype(int) - expected) == 12)
+        print('{:>15}  decimation {}  {:8.3f} ms/s  speedup {:4.2f}x  '
+              'same note {:6.2%}  octave off {:6.2%}'.format(
+                  '', factor, t / seconds * 1e3, reference / t, same, octave))
+
+
+def get_arguments():
+    parser = argparse.ArgumentParser(
+        description='Compare the analysis with and without decimation.')
+    parser.add_argument(
+        'seconds', nargs='?', type=int, default=60, metavar='SECONDS_OF_AUDIO',
+        help='Duration of each signal.'
+    )
+    parser.add_argument(
+        'factors', nargs='*', type=int, default=[2, 4, 8], metavar='FACTOR',
+        help='Decimation factors compared.'
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = get_arguments()
+    for signal in sorted(SIGNALS):
+        bench(signal, args.seconds, args.factors)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""Check that the array implementations of the filters give the same output
+as the original list implementations on a corpus of random sequences, then
+compare their speed on long sequences.
+
+Usage: python benchmarks/bench_filters.py [NUM_PAIRS ...]
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from gazouilli import filters  # noqa: E402
+from gazouilli.notes import NoteSequence  # noqa: E402
+
+
+# The original implementations of the filters
+
+def weed_out_short_notes(pairs, duration_threshold=0.25):
+    return [(n, d) for (n, d) in pairs if d > duration_threshold]
+
+
+def absorb_short_notes(pairs, duration_threshold=0.25):
+    result = []
+    i = 0
+    while i < len(pairs):
+        pair = pairs[i]
+        n, d = pair
+        try:
+            n1, d1 = pairs[i + 1]
+            n2, d2 = pairs[i + 2]
+        except IndexError:
+            if d > duration_threshold:
+                result.append(pair)
+            i += 1
+            continue
+
+        if n == n2 and d1 < duration_threshold:
+            result.append((n, d + d1 + d2))
+            i += 3
+        else:
+            if d > duration_threshold:
+                result.append(pair)
+            i += 1
+
+    return result
+
+
+def convert_duration_to_integer(pairs, ratio=16):
+    return [(n, int(round(d * ratio))) for n, d in pairs]
+
+
+ORIGINALS = [
+    (weed_out_short_notes, 'duration_threshold'),
+    (absorb_short_notes, 'duration_threshold'),
+    (convert_duration_to_integer, 'ratio'),
+]
+
+
+def random_pairs(rng, size):
+    """Return random pairs from a small set of notes and durations, so that
+    there are many ties and (n, short, n) patterns, including overlapping
+    ones.
+    """
+    durations = [0.0, 0.03125, 0.09375, 0.25, 0.5, 1.0]
+    return [
+        (rng.choice([0, 60, 61, 62]),
+         rng.choice(durations) if rng.random() < 0.8 else rng.random() * 2)
+        for _ in range(size)
+    ]
+
+
+def check(num_cases=20000, seed=0):
+    rng = random.Random(seed)
+    for _ in range(num_cases):
+        pairs = random_pairs(rng, rng.randint(0, 30))
+        sequence = NoteSequence.from_pairs(pairs)
+        for original, option in ORIGINALS:
+            value = rng.choice([0.25, 0.5, 1.0, 16, 3])
+            expected = original(pairs, value)
+            fn = getattr(filters, original.__name__)
+            for actual in (fn(pairs, **{option: value}),
+                           fn(sequence, **{option: value})):
+                actual = list(actual)
+                assert actual == expected, (original.__name__, pairs, value)
+    print('{} random sequences: outputs are identical'.format(num_cases))
+
+
+def bench(size):
+    rng = random.Random(size)
+    pairs = random_pairs(rng, size)
+    sequence = NoteSequence.from_pairs(pairs)
+
+    for original, _ in ORIGINALS:
+        fn = getattr(filters, original.__name__)
+        timings = []
+        for name, run in [('original', lambda: original(pairs)),
+                          ('generator', lambda: list(fn(pairs))),
+                          ('arrays', lambda: fn(sequence))]:
+            t = min(timeit.repeat(run, number=1, repeat=3))
+            timings.append('{} {:8.1f} ms'.format(name, t * 1e3))
+        print('{:>9} pairs  {:<28} {}'.format(
+            size, original.__name__, '  '.join(timings)))
+
+
+def get_arguments():
+    parser = argparse.ArgumentParser(
+        description='Check and compare the array and list implementations '
+                    'of the filters.')
+    parser.add_argument(
+        'sizes', nargs='*', type=int, default=[10**6], metavar='NUM_PAIRS',
+        help='Numbers of pairs filtered.'
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = get_arguments()
+    check()
+    for size in args.sizes:
+        bench(size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Compare the speed of the MIDI track encoding of `writers.midi` with the
+original implementation on long tracks.
+
+Usage: python benchmarks/bench_midi.py [NUM_EVENTS ...]
+"""
+
+from __future__ import print_function
+
+import argparse
+import array
+import io
+import os
+import struct
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from gazouilli.writers.midi import (  # noqa: E402
+    Midi, encode_track, get_bytes_for_tempo)
+
+
+def original_var_len(value):
+    buf = value & 0x7f
+    value >>= 7
+    while value:
+        buf <<= 8
+        buf |= 0x80
+        buf += value & 0x7f
+        value >>= 7
+
+    a = array.array('B')
+    while True:
+        a.append(buf & 0xFF)
+        if buf & 0x80:
+            buf >>= 8
+        else:
+            break
+
+    return a.tobytes()
+
+
+def original_encode_track(events, tempo, velocity):
+    """The original implementation (using a bytes buffer, since it was
+    broken with `io.StringIO`)
+    """
+    buf = io.BytesIO()
+    buf.write(b'\x00')
+    buf.write(b'\xff\x51\x03')
+    buf.write(get_bytes_for_tempo(tempo))
+
+    running_time = 0
+    for time, event, note in events:
+        if note == 0:
+            running_time += time
+            continue
+
+        buf.write(original_var_len(time + running_time))
+        buf.write(struct.pack('>BBB', event, note, velocity))
+
+        running_time = 0
+
+    buf.write(b'\x00\xff\x2f\x00')
+    return buf.getvalue()
+
+
+def bench(num_events, seed=0):
+    rng = np.random.RandomState(seed)
+    notes = rng.randint(0, 128, num_events // 2)
+    durations = rng.exponential(0.5, num_events // 2)
+    midi = Midi(list(zip(notes.tolist(), durations.tolist())))
+
+    expected = original_encode_track(midi.track, midi.tempo, midi.velocity)
+    actual = encode_track(midi.track, midi.tempo, midi.velocity)
+    assert bytes(actual) == expected, 'outputs differ'
+
+    timings = []
+    for name, fn in [('original', original_encode_track),
+                     ('bytearray', encode_track)]:
+        t = min(timeit.repeat(
+            lambda: fn(midi.track, midi.tempo, midi.velocity),
+            number=1, repeat=3))
+        timings.append('{} {:8.1f} ms'.format(name, t * 1e3))
+
+    print('{:>9} events  {}'.format(len(midi.track), '  '.join(timings)))
+
+
+def get_arguments():
+    parser = argparse.ArgumentParser(
+        description='Compare the MIDI track encoding with the original '
+                    'implementation.')
+    parser.add_argument(
+        'sizes', nargs='*', type=int, default=[10**4, 10**6],
+        metavar='NUM_EVENTS',
+        help='Numbers of events encoded.'
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = get_arguments()
+    for num_events in args.sizes:
+        bench(num_events)
+
+
+if __name__ == '__main__':
+    main()
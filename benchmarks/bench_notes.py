@@ -0,0 +1,68 @@
+"""Compare the memory used by a list of (note, duration) tuples with that of
+a `NoteSequence` holding the same pairs.
+
+Usage: python3 benchmarks/bench_notes.py [NUM_PAIRS ...]
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from gazouilli.notes import NoteSequence  # noqa: E402
+
+
+def measure(build):
+    """Return the object built by `build` and the memory (in bytes) that
+    was allocated to build it and is still in use.
+    """
+    tracemalloc.start()
+    obj = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, size
+
+
+def bench(size, seed=0):
+    rng = np.random.RandomState(seed)
+    notes = rng.randint(0, 128, size)
+    durations = rng.randint(1, 20, size) * (4096 / 44100.0)
+
+    pairs, list_size = measure(
+        lambda: list(zip(notes.tolist(), durations.tolist())))
+    sequence, sequence_size = measure(
+        lambda: NoteSequence(notes, durations.copy()))
+    assert sequence == pairs, 'contents differ'
+
+    print('{:>9} pairs  list {:8.1f} MB  NoteSequence {:8.1f} MB  '
+          '({:.1f} vs {:.1f} bytes per pair)'.format(
+              size, list_size / 1e6, sequence_size / 1e6,
+              list_size / float(size), sequence_size / float(size)))
+
+
+def get_arguments():
+    parser = argparse.ArgumentParser(
+        description='Compare the memory used by lists of pairs and '
+                    'NoteSequence.')
+    parser.add_argument(
+        'sizes', nargs='*', type=int, default=[10000, 1000000],
+        metavar='NUM_PAIRS',
+        help='Numbers of pairs stored.'
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = get_arguments()
+    for size in args.sizes:
+        bench(size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Compare the pitch estimators of `gazouilli.pitch`: cost per window, and
+fraction of the windows of synthetic melodies (pure sines, and notes whose
+second harmonic is louder than their fundamental) whose note is found, for
+different window sizes.
+
+Usage: python benchmarks/bench_pitch.py [SECONDS_OF_AUDIO [WINDOW_SIZE ...]]
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from gazouilli.gazouilli import WaveReader  # noqa: E402
+from gazouilli.pitch import ESTIMATORS  # noqa: E402
+from gazouilli.utils import quantize  # noqa: E402
+from synth import FRAMERATE, melody, melody_notes  # noqa: E402
+
+
+NOTE_LENGTH = 0.25
+
+# Notes from E1 (41 Hz) to F#6 (1480 Hz)
+LOWEST, HIGHEST = 28, 91
+
+TIMBRES = {
+    'sine': (1.0,),
+    'rich': (0.5, 1.0, 0.7, 0.4),
+}
+
+
+def expected_notes(seconds, window_size):
+    """Return the note of each window of the melody, or -1 for the windows
+    overlapping two notes (which are not counted).
+    """
+    notes = melody_notes(seconds, NOTE_LENGTH, lowest=LOWEST,
+                         highest=HIGHEST)
+    samples_per_note = int(NOTE_LENGTH * FRAMERATE)
+    starts = np.arange(int(seconds * FRAMERATE) // window_size) * window_size
+    first = starts // samples_per_note
+    last = (starts + window_size - 1) // samples_per_note
+    return np.where(first == last, notes[first], -1)
+
+
+def bench(seconds, window_size, timbre, repeat=3):
+    data = melody(seconds, lowest=LOWEST, highest=HIGHEST,
+                  harmonics=TIMBRES[timbre])
+    expected = expected_notes(seconds, window_size)
+    counted = expected > 0
+
+    for name in sorted(ESTIMATORS):
+        reader = WaveReader(window_size=window_size, pitch_estimator=name)
+        notes = quantize(reader.get_frequencies(data, len(data), FRAMERATE))
+        t = min(timeit.repeat(
+            lambda: reader.get_frequencies(data, len(data), FRAMERATE),
+            number=1, repeat=repeat))
+
+        errors = notes[counted].astype(int) - expected[counted]
+        print('{:>5} {:>5}  {:<7} {:7.2f} us/window  correct {:6.2%}  '
+              'octave off {:6.2%}'.format(
+                  window_size, timbre, name, t / len(notes) * 1e6,
+                  np.mean(errors == 0), np.mean(np.abs(errors) == 12)))
+
+
+def get_arguments():
+    parser = argparse.ArgumentParser(
+        description='Compare the pitch estimators of gazouilli.pitch.')
+    parser.add_argument(
+        'seconds', nargs='?', type=int, default=60, metavar='SECONDS_OF_AUDIO',
+        help='Duration of each melody.'
+    )
+    parser.add_argument(
+        'window_sizes', nargs='*', type=int, default=[1024, 2048, 4096],
+        metavar='WINDOW_SIZE',
+        help='Window sizes compared.'
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = get_arguments()
+    for window_size in args.window_sizes:
+        for timbre in sorted(TIMBRES):
+            bench(args.seconds, window_size, timbre)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Compare how the run-length encoding of `gazouilli.utils` scales with the
+number of windows, as a whole (`collect_consecutive_values`) or in batches
+(`RunLengthEncoder`), against the original quadratic implementation.
+
+Usage: python benchmarks/bench_rle.py [NUM_WINDOWS ...]
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from gazouilli.utils import (  # noqa: E402
+    RunLengthEncoder, collect_consecutive_values)
+
+
+# Number of windows given at a time to `RunLengthEncoder`
+BATCH_SIZE = 256
+
+# Past this size the original implementation takes too long to be measured
+MAX_QUADRATIC_SIZE = 20000
+
+
+def quadratic_collect_consecutive_values(seq):
+    """The original implementation"""
+    pairs = []
+    sq = list(seq)
+    while len(sq) > 0:
+        val = sq[0]
+        xs = [x == val for x in sq]
+        if all(xs):
+            count = len(xs)
+        else:
+            count = xs.index(False)
+        pairs.append((val, count))
+        sq = sq[count:]
+    return pairs
+
+
+def notes(size, seed=0):
+    """Return `size` random notes with runs of 1 to 4 windows"""
+    rng = np.random.RandomState(seed)
+    runs = rng.randint(1, 5, size)
+    vals = rng.randint(0, 128, size)
+    return np.repeat(vals, runs)[:size].tolist()
+
+
+def encode_in_batches(seq):
+    encoder = RunLengthEncoder()
+    pairs = []
+    for i in range(0, len(seq), BATCH_SIZE):
+        pairs.extend(encoder.feed(seq[i:i + BATCH_SIZE]))
+    return pairs + encoder.flush()
+
+
+def bench(size):
+    seq = notes(size)
+    array = np.array(seq)
+
+    expected = collect_consecutive_values(seq)
+    assert encode_in_batches(array) == expected, 'outputs differ'
+
+    fns = [
+        ('whole', lambda: collect_consecutive_values(seq)),
+        ('batches', lambda: encode_in_batches(array)),
+    ]
+    if size <= MAX_QUADRATIC_SIZE:
+        assert quadratic_collect_consecutive_values(seq) == expected
+        fns.append(
+            ('original', lambda: quadratic_collect_consecutive_values(seq)))
+
+    timings = ['{} {:9.2f} ms'.format(name, min(timeit.repeat(
+        fn, number=1, repeat=3)) * 1e3) for name, fn in fns]
+    print('{:>9} windows  {}'.format(size, '  '.join(timings)))
+
+
+def get_arguments():
+    parser = argparse.ArgumentParser(
+        description='Compare the run-length encoders of gazouilli.utils.')
+    parser.add_argument(
+        'sizes', nargs='*', type=int,
+        default=[1000, 5000, 20000, 100000, 1000000], metavar='NUM_WINDOWS',
+        help='Numbers of windows encoded.'
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = get_arguments()
+    for size in args.sizes:
+        bench(size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""Measure the startup time of the `gazouilli` command: the time to import
+`gazouilli.cli` (as reported by `python -X importtime`, with the slowest
+imports), and the wall-clock time of `gazouilli --help` over that of an empty
+interpreter. Also check that `--help` does not import numpy.
+
+Exit with code 1 if the import takes longer than the budget, or if numpy is
+imported.
+
+Usage: python benchmarks/bench_startup.py [--budget MS] [--repeat N]
+
+Requires Python 3.7 or later (for `-X importtime`).
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+HELP = ('import sys; from gazouilli.cli import run; '
+        'sys.argv = ["gazouilli", "--help"]\n'
+        'try:\n    run()\nexcept SystemExit:\n    pass\n'
+        'sys.stderr.write(str("numpy" in sys.modules))')
+
+
+def python(args, env):
+    """Run the interpreter with the arguments `args`, and return its standard
+    error output.
+    """
+    process = subprocess.Popen(
+        [sys.executable] + args, env=env, stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE, universal_newlines=True)
+    _, err = process.communicate()
+    if process.returncode:
+        raise RuntimeError(err)
+    return err
+
+
+def parse_importtime(output, module):
+    """Return a list of `(module, self_us, cumulative_us)` triples of the
+    imports made by the import of `module` (itself last) in the output of
+    `-X importtime`.
+    """
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        if not name.startswith('  '):
+            # The previous top-level imports are those of the interpreter
+            if name.strip() != module:
+                imports = []
+                continue
+        imports.append((name.strip(), int(self_us), int(cumulative_us)))
+    return imports
+
+
+def timed(args, env, repeat):
+    """Return the best wall-clock time of `repeat` runs of the interpreter"""
+    times = []
+    for _ in range(repeat):
+        start = time.time()
+        python(args, env)
+        times.append(time.time() - start)
+    return min(times)
+
+
+def get_arguments():
+    parser = argparse.ArgumentParser(
+        description='Measure the startup time of the gazouilli command.')
+    parser.add_argument(
+        '--budget', type=float, default=50.0, metavar='MS',
+        help='Maximum time (in milliseconds) to import gazouilli.cli.'
+    )
+    parser.add_argument(
+        '-r', '--repeat', type=int, default=10,
+        help='Number of runs of each measure (the best time is kept).'
+    )
+    parser.add_argument(
+        '--top', type=int, default=10,
+        help='Number of the slowest imports to show.'
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = get_arguments()
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [ROOT] + [p for p in [env.get('PYTHONPATH')] if p])
+    # The modules are compiled by the first run, as they would be when
+    # installed, so that compiling them is not measured
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    python(['-c', 'import gazouilli.cli'], env)
+
+    runs = [parse_importtime(python(
+        ['-X', 'importtime', '-c', 'import gazouilli.cli'], env),
+        'gazouilli.cli') for _ in range(args.repeat)]
+    best = min(runs, key=lambda imports: imports[-1][2])
+    total_ms = best[-1][2] / 1000.0
+
+    print('import gazouilli.cli  {:8.1f} ms  (budget {:.1f} ms)'.format(
+        total_ms, args.budget))
+    for module, self_us, _ in sorted(best, key=lambda i: -i[1])[:args.top]:
+        print('  {:<40} {:8.1f} ms'.format(module, self_us / 1000.0))
+
+    baseline = timed(['-c', 'pass'], env, args.repeat)
+    help_time = timed(['-c', HELP], env, args.repeat)
+    print('gazouilli --help      {:8.1f} ms  (empty interpreter '
+          '{:.1f} ms)'.format((help_time - baseline) * 1e3, baseline * 1e3))
+
+    numpy_imported = python(['-c', HELP], env).endswith('True')
+    if numpy_imported:
+        print('numpy is imported by `gazouilli --help`')
+
+    if total_ms > args.budget or numpy_imported:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Compare the cost of the batched DFT in `WaveReader.get_frequencies` with
+the original window-by-window loop, and with overlapping windows.
+
+Usage: python benchmarks/bench_stft.py [SECONDS_OF_AUDIO ...]
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from gazouilli.gazouilli import WaveReader  # noqa: E402
+from synth import FRAMERATE, melody  # noqa: E402
+
+
+def loop_get_frequencies(reader, data, nframes, framerate):
+    """The original implementation, one `np.fft.fft` call per window"""
+    window_size = reader.window_size
+    freqs = []
+    xs = np.fft.fftfreq(window_size, 1.0 / framerate)[:window_size // 4]
+    for i in range(nframes // window_size):
+        window = data[i * window_size:(i + 1) * window_size]
+        ys = abs(np.fft.fft(window)[:window_size // 4])
+        if ys.max() < reader.silence_threshold:
+            freqs.append(0.0)
+        else:
+            freqs.append(xs[ys.argmax()])
+    return freqs
+
+
+def bench(seconds, repeat=3):
+    reader = WaveReader()
+    data = melody(seconds)
+    nframes = len(data)
+
+    expected = loop_get_frequencies(reader, data, nframes, FRAMERATE)
+    actual = reader.get_frequencies(data, nframes, FRAMERATE)
+    assert np.array_equal(expected, actual), 'outputs differ'
+
+    results = []
+    for fn in (loop_get_frequencies, WaveReader.get_frequencies):
+        t = min(timeit.repeat(
+            lambda: fn(reader, data, nframes, FRAMERATE),
+            number=1, repeat=repeat))
+        results.append(t / seconds * 1e3)
+
+    loop, batched = results
+    print('{:>8}s  loop {:8.3f} ms/s  batched {:8.3f} ms/s  speedup {:5.1f}x'
+          .format(seconds, loop, batched, loop / batched))
+
+    # Overlapping windows: the cost should grow with the number of windows
+    # only, the frame matrix being a view on the samples
+    overlapping = WaveReader(hop_size=reader.window_size // 4,
+                             window_function='hann')
+    t = min(timeit.repeat(
+        lambda: overlapping.get_frequencies(data, nframes, FRAMERATE),
+        number=1, repeat=repeat))
+    print('{:>8}s  4x overlap, hann window {:8.3f} ms/s  ({:4.2f}x batched '
+          'per window)'.format(seconds, t / seconds * 1e3,
+                               t / seconds * 1e3 / batched / 4))
+
+
+def get_arguments():
+    parser = argparse.ArgumentParser(
+        description='Compare the batched DFT of WaveReader with a '
+                    'window-by-window loop.')
+    parser.add_argument(
+        'seconds', nargs='*', type=int, default=[10, 60, 600],
+        metavar='SECONDS_OF_AUDIO',
+        help='Durations of the audio analysed.'
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = get_arguments()
+    for seconds in args.seconds:
+        bench(seconds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+"""Time each stage of the conversion (`WaveReader.read`, `prepare_freqs`,
+each filter and each writer) on a corpus of synthetic WAV files, and
+optionally compare the results with those of a previous run.
+
+Each file of the corpus is benchmarked in its own process, so that the peak
+resident memory reported for it is not affected by the other files.
+
+Usage:
+
+    python benchmarks/bench_suite.py --output results.json
+    python benchmarks/bench_suite.py --baseline results.json --threshold 0.5
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from gazouilli import filters, writers  # noqa: E402
+from gazouilli.gazouilli import WaveReader, map_samples  # noqa: E402
+from synth import FRAMERATE, SIGNALS, write_signal  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+class NullStream(object):
+    """Stream discarding the output of the writers"""
+
+    def write(self, data):
+        pass
+
+
+def corpus_file(directory, signal, seconds):
+    """Return the name of the WAV file of the corpus with `seconds` of the
+    signal named `signal`, generating it if it is not in `directory` yet.
+    """
+    filename = os.path.join(directory, '{}-{}s.wav'.format(signal, seconds))
+    if not os.path.exists(filename):
+        write_signal(filename + '.tmp', signal, seconds)
+        os.rename(filename + '.tmp', filename)
+    return filename
+
+
+def peak_rss():
+    """Return the peak resident memory of the process in bytes, or None if it
+    is not available.
+    """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def bench_file(task):
+    """Return the results of the benchmarks of the WAV file `infile`"""
+    infile, seconds, repeat = task
+    reader = WaveReader()
+
+    def timed(fn):
+        # The first call is not timed: it pays for the page faults of the
+        # first allocations of the process (whose cost otherwise depends on
+        # what the parent process did before the fork) and for warming up
+        # the caches
+        fn()
+        return min(timeit.repeat(fn, number=1, repeat=repeat))
+
+    stages = {}
+    stages['read'] = timed(lambda: reader.read(infile))
+
+    data, framerate = map_samples(infile)
+    freqs = reader.get_frequencies(data, len(data), framerate)
+    stages['prepare_freqs'] = timed(
+        lambda: reader.prepare_freqs(freqs, framerate))
+
+    pairs = reader.prepare_freqs(freqs, framerate)
+    for name in filters.__all__:
+        fn = getattr(filters, name)
+        stages[name] = timed(lambda: list(fn(pairs)))
+
+    for name in writers.__all__:
+        writer = getattr(writers, name)
+        stages['write ' + name.lower()] = timed(
+            lambda: writer(pairs).write(NullStream()))
+
+    return {
+        'audio_seconds': seconds,
+        'pairs': len(pairs),
+        'peak_rss': peak_rss(),
+        'stages': dict(
+            (name, {'seconds': t, 'throughput': seconds / t if t else None})
+            for name, t in stages.items()
+        ),
+    }
+
+
+def run(signals, durations, directory, repeat=10):
+    """Benchmark each signal of `signals` for each length of `durations`
+    (in seconds), and return the results as a dictionary.
+    """
+    results = {}
+    for signal in signals:
+        for seconds in durations:
+            infile = corpus_file(directory, signal, seconds)
+
+            # A new process for each file, so that `peak_rss` is its own. It
+            # is spawned rather than forked, so that its timings do not
+            # depend on what this process did before (e.g. generating the
+            # corpus makes the analysis of a forked process faster).
+            pool = multiprocessing.get_context('spawn').Pool(1)
+            try:
+                result = pool.apply(bench_file, ((infile, seconds, repeat),))
+            finally:
+                pool.close()
+                pool.join()
+
+            name = '{}-{}s'.format(signal, seconds)
+            results[name] = result
+            print_result(name, result)
+
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'system': platform.system(),
+        },
+        'results': results,
+    }
+
+
+def print_result(name, result):
+    rss = result['peak_rss']
+    print('{}: {} pairs, peak RSS {}'.format(
+        name, result['pairs'],
+        '{:.1f} MB'.format(rss / 1e6) if rss is not None else 'unknown'))
+    for stage, timing in sorted(result['stages'].items()):
+        print('    {:<30} {:10.4f} s {:12.1f} audio-s/s'.format(
+            stage, timing['seconds'], timing['throughput'] or float('inf')))
+
+
+def compare(baseline, current, threshold, min_seconds=1e-3):
+    """Return a list of `(file, stage, baseline, current)` tuples for the
+    stages that are slower in `current` than in `baseline` by more than
+    `threshold` (as a fraction of the baseline time). Stages taking less
+    than `min_seconds` in the baseline are ignored, since their timings are
+    too noisy.
+    """
+    regressions = []
+    for name, result in sorted(current['results'].items()):
+        previous = baseline['results'].get(name)
+        if previous is None:
+            continue
+        for stage, timing in sorted(result['stages'].items()):
+            if stage not in previous['stages']:
+                continue
+            before = previous['stages'][stage]['seconds']
+            after = timing['seconds']
+            if before >= min_seconds and after > before * (1 + threshold):
+                regressions.append((name, stage, before, after))
+    return regressions
+
+
+def get_arguments():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the stages of the conversion.')
+    parser.add_argument(
+        '-s', '--signals', nargs='+', default=sorted(SIGNALS),
+        choices=sorted(SIGNALS),
+        help='Signals of the corpus to benchmark.'
+    )
+    parser.add_argument(
+        '-d', '--durations', nargs='+', type=int, default=[10, 60, 600],
+        metavar='SECONDS',
+        help='Lengths of the files of the corpus, in seconds.'
+    )
+    parser.add_argument(
+        '--corpus', metavar='DIRECTORY',
+        default=os.path.join(tempfile.gettempdir(), 'gazouilli-corpus'),
+        help='Directory where the files of the corpus are generated.'
+    )
+    parser.add_argument(
+        '-r', '--repeat', type=int, default=10,
+        help='Number of times each stage is timed (the best time is kept).'
+    )
+    parser.add_argument(
+        '-o', '--output', metavar='FILE',
+        help='Save the results as JSON to FILE.'
+    )
+    parser.add_argument(
+        '-b', '--baseline', metavar='FILE',
+        help='Compare the results with those saved in FILE, and exit with '
+             'code 1 if there are regressions.'
+    )
+    parser.add_argument(
+        '-t', '--threshold', type=float, default=0.5,
+        help='Slowdown of a stage (as a fraction of its baseline time) above '
+             'which it is considered a regression. The timings of two runs on '
+             'the same machine commonly differ by up to 30%%, so smaller '
+             'thresholds need more `repeat`s and a quiet machine.'
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = get_arguments()
+
+    if not os.path.isdir(args.corpus):
+        os.makedirs(args.corpus)
+    print('Sample rate {} Hz, corpus in {}'.format(FRAMERATE, args.corpus))
+
+    current = run(args.signals, args.durations, args.corpus, args.repeat)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+        regressions = compare(baseline, current, args.threshold)
+        for name, stage, before, after in regressions:
+            print('Regression: {} {}: {:.4f} s -> {:.4f} s ({:+.0%})'.format(
+                name, stage, before, after, after / before - 1))
+        if regressions:
+            sys.exit(1)
+        print('No regressions above {:.0%}'.format(args.threshold))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""Deterministic synthetic audio used by the benchmarks"""
+
+import contextlib
+import wave
+
+import numpy as np
+
+
+FRAMERATE = 44100
+
+
+def melody_notes(seconds, note_length=0.25, seed=0, rests=0.125,
+                 lowest=40, highest=90):
+    """Return the MIDI notes of the melody generated by `melody` with the
+    same arguments, with 0 for the silences.
+    """
+    rng = np.random.RandomState(seed)
+    num_notes = int(np.ceil(seconds / note_length))
+
+    notes = rng.randint(lowest, highest, num_notes)
+    notes[rng.random_sample(num_notes) < rests] = 0
+    return notes
+
+
+def melody(seconds, framerate=FRAMERATE, note_length=0.25, seed=0,
+           rests=0.125, lowest=40, highest=90, harmonics=(1.0,)):
+    """Return `seconds` of a random sine melody as an array of 16-bit
+    samples. Notes are chosen from `lowest` to `highest` (excluded), by
+    default in the range of a piano, and about a fraction `rests` of them
+    are silences.
+
+    `harmonics` are the relative amplitudes of the partials of each note
+    (by default, a pure sine).
+    """
+    samples_per_note = int(note_length * framerate)
+    notes = melody_notes(seconds, note_length, seed, rests, lowest, highest)
+    freqs = np.where(notes > 0, 440.0 * 2 ** ((notes - 69) / 12.0), 0.0)
+
+    t = np.arange(samples_per_note) / float(framerate)
+    signal = np.zeros(len(notes) * samples_per_note)
+    for h, amplitude in enumerate(harmonics, 1):
+        signal += amplitude * np.sin(
+            2 * np.pi * h * np.outer(freqs, t)).ravel()
+    signal = signal[:int(seconds * framerate)] / sum(harmonics)
+
+    return (signal * 16000).astype('<i2')
+
+
+def sparse_melody(seconds, framerate=FRAMERATE, seed=0):
+    """Return a melody where most of the notes are silences"""
+    return melody(seconds, framerate, seed=seed, rests=0.8)
+
+
+def chirp(seconds, framerate=FRAMERATE, seed=0, low=80.0, high=4000.0,
+          period=10.0):
+    """Return `seconds` of sine sweeps going exponentially from `low` to
+    `high` Hz every `period` seconds. `seed` is the index of the first sample
+    in units of `seconds`, so that consecutive chunks of a long chirp can be
+    generated separately.
+    """
+    start = int(seed * seconds * framerate)
+    t = (np.arange(int(seconds * framerate)) + start) / float(framerate)
+    t %= period
+
+    # Phase of a sweep whose frequency is low * rate ** t
+    rate = (high / low) ** (1.0 / period)
+    phase = 2 * np.pi * low * (rate ** t - 1) / np.log(rate)
+
+    return (np.sin(phase) * 16000).astype('<i2')
+
+
+def noise(seconds, framerate=FRAMERATE, seed=0):
+    """Return `seconds` of white noise"""
+    rng = np.random.RandomState(seed)
+    signal = rng.normal(0, 4000, int(seconds * framerate))
+    return np.clip(signal, -32768, 32767).astype('<i2')
+
+
+# Signals of the benchmark corpus, by name. Each one is a function taking a
+# number of seconds, a framerate and a seed.
+SIGNALS = {
+    'melody': melody,
+    'sparse': sparse_melody,
+    'chirp': chirp,
+    'noise': noise,
+}
+
+
+def write_signal(filename, signal, seconds, framerate=FRAMERATE,
+                 chunk_seconds=60):
+    """Write `seconds` of the signal named `signal` to the WAV file
+    `filename`. The signal is generated `chunk_seconds` at a time (the chunk
+    index being used as seed), so that hours of audio can be written without
+    holding them in memory.
+    """
+    fn = SIGNALS[signal]
+    with contextlib.closing(wave.open(filename, 'w')) as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(framerate)
+
+        num_frames = int(seconds * framerate)
+        for i, low in enumerate(range(0, num_frames,
+                                      chunk_seconds * framerate)):
+            # The last chunk is cut from a full chunk, so that the start of
+            # the signal does not depend on its total length
+            samples = fn(chunk_seconds, framerate, seed=i)
+            w.writeframes(samples[:num_frames - low].tobytes())
+
+
+def write_wav(filename, samples, framerate=FRAMERATE):
+    """Write the 16-bit mono `samples` to the WAV file `filename`"""
+    with contextlib.closing(wave.open(filename, 'w')) as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(framerate)
+        w.writeframes(np.asarray(samples, dtype='<i2').tobytes())
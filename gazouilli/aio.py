@@ -0,0 +1,132 @@
+"""
+asyncio interface to `WaveReader` and `Gazouilli` (Python 3 only).
+
+The WAV files are read and analysed in an executor (by default the thread
+pool of the event loop), one batch of windows at a time, so that the event
+loop is never blocked for longer than it takes to schedule a batch. Since
+each batch is awaited separately, a conversion can be cancelled between two
+batches.
+
+When the reader has a cache, a profiler, checkpoints or more than one job,
+`AsyncWaveReader.read` runs its whole `read` in the executor instead, so that
+these are used, and the conversion can then only be cancelled before or after
+the analysis.
+"""
+
+import asyncio
+import functools
+import wave
+
+import numpy as np
+
+from .gazouilli import GazouilliException, WaveReader, open_wave_file
+from .utils import RunLengthEncoder, quantize
+
+
+class AsyncWaveReader(object):
+
+    def __init__(self, reader=None, executor=None, max_concurrency=4):
+        """
+        `reader` is the `WaveReader` used for the analysis (by default, one
+        with default parameters).
+
+        `executor` is the `concurrent.futures` executor in which the file
+        I/O and DFT computations are done. It must be a thread pool, since
+        the files are read incrementally. By default, the executor of the
+        event loop is used.
+
+        `max_concurrency` is the maximum number of files that are read at
+        the same time. Other calls wait for one of them to be done.
+        """
+        self.reader = reader or WaveReader()
+        self.executor = executor
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+
+    @property
+    def semaphore(self):
+        # Created on first use, so that it belongs to the running loop (before
+        # Python 3.10, it is bound to the current loop when it is created)
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def read(self, infile):
+        """Same as `WaveReader.read`"""
+        reader = self.reader
+        if (reader.cache is not None or reader.profiler is not None or
+                reader.checkpoint_interval is not None or reader.jobs != 1):
+            async with self.semaphore:
+                return await self._run(reader.read, infile)
+
+        async with self.semaphore:
+            w = await self._open(infile)
+            reader = self.reader.for_framerate(w.getframerate())
+            try:
+                batches = [freqs async for freqs in
+                           self._iter_frequencies(reader, w)]
+            finally:
+                w.close()
+
+        freqs = np.concatenate(batches) if batches else np.zeros(0)
+        return reader.prepare_freqs(freqs, w.getframerate())
+
+    async def stream(self, infile):
+        """Same as `WaveReader.stream`, but as an asynchronous iterator"""
+        encoder = RunLengthEncoder()
+
+        async with self.semaphore:
+            w = await self._open(infile)
+            reader = self.reader.for_framerate(w.getframerate())
+            try:
+                seconds_per_window = (
+                    (1.0 / w.getframerate()) * reader.hop_size)
+                async for freqs in self._iter_frequencies(reader, w):
+                    notes = quantize(freqs, reader.reference_pitch)
+                    for note, count in encoder.feed(notes):
+                        yield (note, count * seconds_per_window)
+            finally:
+                w.close()
+
+        for note, count in encoder.flush():
+            yield (note, count * seconds_per_window)
+
+    async def convert(self, gazouilli, infile, apply_filters=True):
+        """Read the WAV file `infile`, and convert the resulting pairs with
+        the `Gazouilli` instance `gazouilli`. The filters and the writer are
+        run in the executor.
+        """
+        pairs = await self.read(infile)
+        await self._run(gazouilli.convert, pairs, apply_filters)
+
+    async def _open(self, infile):
+        try:
+            return await self._run(open_wave_file, infile)
+        except (IOError, wave.Error) as e:
+            raise GazouilliException(
+                'Cannot read WAV file.\nGot error: "{}"'.format(e))
+
+    async def _iter_frequencies(self, reader, w):
+        # Same as `reader.iter_frequencies`, with each batch computed in the
+        # executor
+        batches = reader.iter_frequencies(w)
+        while True:
+            future = self._run(next, batches, None)
+            try:
+                freqs = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # Wait for the batch being read, so that the file is not
+                # closed while it is still in use.
+                await asyncio.wait([future])
+                raise
+            except (IOError, wave.Error) as e:
+                raise GazouilliException(
+                    'Cannot read WAV file.\nGot error: "{}"'.format(e))
+            if freqs is None:
+                return
+            yield freqs
+
+    def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(
+            self.executor, functools.partial(fn, *args))
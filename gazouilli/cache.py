@@ -0,0 +1,111 @@
+"""
+On-disk cache of the raw frequencies computed by `WaveReader`.
+
+The frequencies of the windows of a recording only depend on its samples and
+on the analysis parameters of the reader, so they can be reused by later
+conversions of the same recording that only differ by their filters or writer.
+Entries are stored as `.npy` files named after a hash of the samples and of
+the parameters, and the least recently used ones are evicted when the total
+size of the cache exceeds its limit.
+"""
+
+import errno
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+
+# Number of samples hashed at a time
+HASH_CHUNK_SIZE = 2**20
+
+
+class AnalysisCache(object):
+
+    def __init__(self, directory, max_size=2**30):
+        """
+        `directory` is where the cache entries are stored. It is created if
+        it does not exist.
+
+        `max_size` is the maximum total size (in bytes) of the entries.
+        """
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+        try:
+            os.makedirs(directory)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+    @staticmethod
+    def key(samples, params):
+        """Return the key for the entry of the array `samples` analysed with
+        the parameters in the tuple `params`.
+        """
+        h = hashlib.sha1(repr(params).encode('utf-8'))
+        for i in range(0, len(samples), HASH_CHUNK_SIZE):
+            chunk = samples[i:i + HASH_CHUNK_SIZE]
+            h.update(np.ascontiguousarray(chunk).tobytes())
+        return h.hexdigest()
+
+    def get(self, key):
+        """Return the array stored for `key`, or None if there is none"""
+        path = self._path(key)
+        try:
+            freqs = np.load(path)
+            os.utime(path, None)  # mark the entry as recently used
+        except (IOError, OSError, ValueError):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return freqs
+
+    def put(self, key, freqs):
+        """Store the array `freqs` for `key`, and evict the least recently
+        used entries if the cache is over its size limit.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, np.asarray(freqs))
+            os.rename(tmp_path, self._path(key))
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries until the total size of
+        the cache is below `max_size`.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.npy'):
+                st = os.stat(os.path.join(self.directory, name))
+                entries.append((st.st_mtime, st.st_size, name))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass  # already removed by another process
+            total_size -= size
+
+    def stats(self):
+        """Return a dictionary with the number of hits and misses"""
+        return {'hits': self.hits, 'misses': self.misses}
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.npy')
@@ -0,0 +1,135 @@
+"""
+Checkpoints of the analysis of a recording by `WaveReader.read`, so that a
+conversion that is interrupted (e.g. on a preemptible machine) can be resumed
+where it stopped instead of starting over.
+
+A checkpoint is stored in a sidecar file next to the recording (its name
+followed by `SUFFIX`), or in another directory (e.g. when the directory of the
+recording is read-only), as a `.npz` archive of the frequencies of the windows
+analysed so far, the runs of notes that are over, and the run that is still
+open (the state of a `RunLengthEncoder`). It is replaced atomically, so that
+an interruption while it is being written leaves the previous one, and it is
+removed once the analysis is complete. The temporary files of the saves that
+were interrupted are removed when the checkpoint is loaded.
+"""
+
+import errno
+import hashlib
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+
+from .utils import RunLengthEncoder
+
+
+SUFFIX = '.checkpoint.npz'
+
+
+class Checkpoint(object):
+
+    def __init__(self, path, key):
+        """
+        `path` is the name of the sidecar file.
+
+        `key` is a string identifying the analysis (the parameters of the
+        reader and the recording): a checkpoint saved with another key is
+        ignored.
+        """
+        self.path = path
+        self.key = key
+
+    @classmethod
+    def for_file(cls, infile, params, nframes, directory=None):
+        """Return the checkpoint of the analysis of the `nframes` samples of
+        the WAV file named `infile` with the parameters in the tuple `params`.
+
+        The checkpoint is saved next to `infile`, or in `directory` if it is
+        given. In that case, its name also includes a hash of the path of
+        `infile`, so that recordings of the same name in different
+        directories have different checkpoints.
+
+        The key includes the size and modification time of the file, so that
+        the checkpoint of a recording is not used for another one later
+        written at the same path (e.g. segments of a capture of the same
+        length).
+        """
+        st = os.stat(infile)
+        path = infile + SUFFIX
+        if directory is not None:
+            digest = hashlib.sha1(
+                os.path.abspath(infile).encode('utf-8')).hexdigest()
+            path = os.path.join(directory, '{}.{}{}'.format(
+                os.path.basename(infile), digest[:12], SUFFIX))
+        return cls(path, repr((params, nframes, st.st_size, st.st_mtime)))
+
+    def load(self):
+        """Return a triple `(freqs, runs, encoder)` of the progress saved in
+        the checkpoint, where `freqs` is the array of the frequencies of the
+        windows already analysed, `runs` a pair of arrays `(notes, counts)`
+        of the runs of notes that are over, and `encoder` a
+        `RunLengthEncoder` holding the open run. Return None if there is no
+        checkpoint for this analysis.
+        """
+        self._remove_temporary_files()
+        try:
+            with np.load(self.path) as f:
+                if str(f['key']) != self.key:
+                    return None
+                value, count = f['open_run'].tolist()
+                return (f['freqs'], (f['notes'], f['counts']),
+                        RunLengthEncoder(value if count else None, count))
+        except (IOError, OSError, ValueError, KeyError, zipfile.BadZipfile):
+            return None
+
+    def save(self, freqs, runs, encoder):
+        """Replace the checkpoint with the progress given as in `load`"""
+        notes, counts = runs
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            os.makedirs(directory)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        prefix, suffix = self._temporary_affixes()
+        fd, tmp_path = tempfile.mkstemp(
+            dir=directory, prefix=prefix, suffix=suffix)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(
+                    f, key=np.array(self.key), freqs=np.asarray(freqs),
+                    notes=np.asarray(notes), counts=np.asarray(counts),
+                    open_run=np.array([encoder.value or 0, encoder.count]))
+            os.rename(tmp_path, self.path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass  # no checkpoint was saved
+
+    def _temporary_affixes(self):
+        # The temporary files of a save are named after the sidecar file, so
+        # that those left by a save that was killed can be found
+        return os.path.basename(self.path) + '.', '.tmp'
+
+    def _remove_temporary_files(self):
+        prefix, suffix = self._temporary_affixes()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            return
+        for name in names:
+            if name.startswith(prefix) and name.endswith(suffix):
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    pass
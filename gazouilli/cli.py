@@ -1,44 +1,236 @@
+# The modules doing the analysis (and numpy) are only imported by the
+# functions that need them, so that the command line starts quickly and
+# `--help` or invalid arguments do not wait for them.
+
 import argparse
+import glob
 import json
+import os.path
 import sys
+import time
+import warnings
 
 from . import filters, writers
-from .gazouilli import Gazouilli, GazouilliException, WaveReader
 
 
-# Names of valid writers
-VALID_WRITERS = [w.lower() for w in writers.__all__]
+# Suffix of the temporary files to which the outputs are written
+TEMP_SUFFIX = '.tmp'
+
+VALID_WRITERS = writers.VALID_WRITERS
 
 
-def convert(infile, output_format, filters_to_use, outfile=None, stdout=False):
+def convert(infile, output_format, filters_to_use, outfile=None, stdout=False,
+            jobs=1, cache_dir=None):
     """Convert input file `infile` to the format given by `output_format`
     using filters in `filters_to_use`.
 
+    If `jobs` is not 1, the analysis of the file is split among that many
+    worker processes (None meaning one per CPU).
+
+    If `cache_dir` is given, the result of the analysis of the file is cached
+    in this directory, and reused by later conversions of the same file.
+
     If `stdout` is True, the output of the writer is written to stdout,
     otherwise it is written to the file `outfile`. If `outfile` is not given
     and the writer has an implementation of the `get_output_filename` method,
-    then the result of this method is used as an output filename.
+    then the result of this method is used as an output filename. The output
+    file is only created if the conversion succeeds.
     """
 
-    writer = getattr(writers, output_format.capitalize())
+    output = {
+        'writer': output_format,
+        'filters': filters_to_use,
+        'output': outfile,
+        'stdout': stdout,
+    }
+    convert_outputs(infile, [output], jobs, cache_dir)
 
-    if stdout:
-        fp = sys.stdout
-    else:
-        if outfile is None:
-            try:
-                outfile = writer.get_output_filename(infile)
-            except NotImplementedError:
-                raise GazouilliException(
-                    'Must specify at least one of `output` or `stdout` option '
-                    'with this writer'
-                )
-        fp = open(outfile, 'wb')
-
-    pairs = WaveReader().read(infile)
-    gazouilli = Gazouilli(writer, filters=filters_to_use, stream=fp)
-    gazouilli.convert(pairs, apply_filters=True)
-    fp.close()
+
+def convert_outputs(infile, outputs, jobs=1, cache_dir=None, profiler=None,
+                    checkpoint_interval=None, checkpoint_dir=None):
+    """Convert input file `infile` once for each output in `outputs`, with a
+    single analysis of the file shared by all the outputs.
+
+    Each output is a dictionary with the key `writer` (the name of the
+    writer), and optionally the keys `filters`, `output` and `stdout` (which
+    have the same meaning as the `filters_to_use`, `outfile` and `stdout`
+    arguments of `convert`), and `writer_options` and `filters_kwargs` (which
+    are given to `Gazouilli`).
+
+    `jobs` and `cache_dir` have the same meaning as for `convert`.
+
+    If `profiler` is a `profiling.Profiler`, the time spent in each stage of
+    the conversion is recorded in it. In that case, the whole file is analysed
+    before the filters and writers are run, so that the stages are timed
+    separately.
+
+    If `checkpoint_interval` is given, the progress of the analysis is saved
+    every `checkpoint_interval` seconds in a sidecar file next to `infile`
+    (or in `checkpoint_dir` if it is given), from which an interrupted
+    conversion of the file resumes (see `WaveReader`). It can only be used
+    when `jobs` is 1.
+
+    Return the numbers of hits and misses of the cache (see
+    `AnalysisCache.stats`), or None if there is no cache.
+    """
+    from .cache import AnalysisCache
+    from .gazouilli import (
+        Gazouilli, WaveReader, convert_all, get_writer_options)
+
+    cache = None
+    if cache_dir is not None:
+        try:
+            cache = AnalysisCache(cache_dir)
+        except OSError as e:
+            warnings.warn('Cannot create the cache directory, continuing '
+                          'without cache. Got error: "{}"'.format(e),
+                          RuntimeWarning)
+    reader = WaveReader(jobs=jobs, cache=cache, profiler=profiler,
+                        checkpoint_interval=checkpoint_interval,
+                        checkpoint_dir=checkpoint_dir)
+
+    # Each output file is written to a temporary file, renamed once the
+    # conversion is done, so that a failed conversion leaves no partial output
+    streams = []
+    done = False
+    try:
+        gazouillis = []
+        for output in outputs:
+            writer = writers.get_writer(output['writer'])
+            if output.get('stdout', False):
+                fp = open_stdout(writer)
+            else:
+                outfile = get_output_path(infile, writer, output.get('output'))
+                fp = open_output(outfile + TEMP_SUFFIX, writer)
+                streams.append((fp, outfile))
+
+            gazouillis.append(Gazouilli(
+                writer, filters=output.get('filters'), stream=fp,
+                writer_options=get_writer_options(
+                    writer, reader, infile, output.get('writer_options')),
+                filters_kwargs=output.get('filters_kwargs'),
+                profiler=profiler
+            ))
+
+        if (jobs == 1 and cache is None and profiler is None and
+                checkpoint_interval is None):
+            pairs = reader.stream(infile)
+        else:
+            pairs = reader.read(infile)
+
+        convert_all(gazouillis, pairs, apply_filters=True)
+        done = True
+        return cache.stats() if cache is not None else None
+
+    finally:
+        for fp, outfile in streams:
+            fp.close()
+            if done:
+                os.rename(fp.name, outfile)
+            else:
+                try:
+                    os.remove(fp.name)
+                except OSError:
+                    pass
+
+
+def open_stdout(writer):
+    """Return the standard output as a binary stream if `writer` writes
+    bytes, and as a text stream otherwise.
+    """
+    # On Python 3, bytes are written to the buffer of the text stdout
+    if writer.binary:
+        return getattr(sys.stdout, 'buffer', sys.stdout)
+    return sys.stdout
+
+
+def get_output_path(infile, writer, outfile):
+    """Return the name of the file to which the output of `writer` for the
+    input file `infile` is written, as described in `convert`.
+    """
+    from .gazouilli import GazouilliException
+
+    if outfile is not None:
+        return outfile
+    try:
+        return writer.get_output_filename(infile)
+    except NotImplementedError:
+        raise GazouilliException(
+            'Must specify at least one of `output` or `stdout` option '
+            'with this writer'
+        )
+
+
+def open_output(outfile, writer):
+    """Open the file `outfile` for the output of `writer`: as a binary stream
+    if the writer writes bytes, and as a text stream otherwise.
+    """
+    if writer.binary or str is bytes:
+        return open(outfile, 'wb')
+    return open(outfile, 'w', newline='')
+
+
+def convert_many(infiles, outputs, jobs=None, cache_dir=None,
+                 checkpoint_interval=None, checkpoint_dir=None):
+    """Convert each file of `infiles` to the `outputs` as with
+    `convert_outputs`, using a pool of `jobs` worker processes (by default,
+    one per CPU). The output filenames of each file are given by the writers'
+    `get_output_filename` method. `cache_dir`, `checkpoint_interval` and
+    `checkpoint_dir` are given to `convert_outputs`.
+
+    Return a list of `(infile, seconds, error, cache_stats)` tuples, in the
+    same order as `infiles`, where `seconds` is the duration of the audio in
+    the file, `error` is None if the conversion was successful, or the error
+    message otherwise, and `cache_stats` is what `convert_outputs` returned
+    (None if it failed). A failure does not stop the conversion of the other
+    files.
+    """
+    import multiprocessing
+
+    tasks = [(infile, outputs, cache_dir, checkpoint_interval, checkpoint_dir)
+             for infile in infiles]
+
+    pool = multiprocessing.Pool(jobs)
+    try:
+        return pool.map(_convert_one, tasks, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _convert_one(task):
+    from .gazouilli import get_wave_parameters
+
+    infile, outputs, cache_dir, checkpoint_interval, checkpoint_dir = task
+    try:
+        framerate, nframes = get_wave_parameters(infile)
+        seconds = nframes / float(framerate)
+        cache_stats = convert_outputs(
+            infile, outputs, cache_dir=cache_dir,
+            checkpoint_interval=checkpoint_interval,
+            checkpoint_dir=checkpoint_dir)
+    except Exception as e:
+        return (infile, 0.0, str(e) or e.__class__.__name__, None)
+    return (infile, seconds, None, cache_stats)
+
+
+def get_input_files(paths):
+    """Expand the list of input `paths` to a list of filenames. Directories
+    are replaced by the WAV files they contain (whatever the case of their
+    extension), and glob patterns by the files they match.
+    """
+    infiles = []
+    for path in paths:
+        if os.path.isdir(path):
+            infiles.extend(sorted(
+                os.path.join(path, name) for name in os.listdir(path)
+                if name.lower().endswith('.wav')
+                and os.path.isfile(os.path.join(path, name))))
+        elif glob.has_magic(path):
+            infiles.extend(sorted(glob.glob(path)))
+        else:
+            infiles.append(path)
+    return infiles
 
 
 def get_arguments():
@@ -47,16 +239,26 @@ def get_arguments():
 
     parser = argparse.ArgumentParser(
         description='Convert a wave audio file to other formats.')
-    parser.add_argument('infile', help='The input wave file.')
+    parser.add_argument(
+        'infile', nargs='+',
+        help='The input wave file. If more than one file is given (or if a '
+             'directory or glob pattern is given), the files are converted in '
+             'parallel and the name of each output file is derived from the '
+             'name of its input file.'
+    )
     parser.add_argument(
         '-c', '--conf',
         help='Configuration file containing the options to be used (in '
              'json format). If this option is used, any other option given '
-             'on the command line will be ignored.'
+             'on the command line will be ignored. Many outputs can be given '
+             'as a list under the "outputs" key, each one with its own '
+             '"writer", "filters", "output", "stdout", "writer_options" and '
+             '"filters_kwargs" options.'
     )
     parser.add_argument(
-        '-w', '--writer', choices=VALID_WRITERS,
-        help='The writer to use for the output.'
+        '-w', '--writer', choices=VALID_WRITERS, action='append',
+        help='The writer to use for the output. This option can be repeated '
+             'to write many outputs from a single analysis of the input file.'
     )
     parser.add_argument(
         '-f', '--filters', nargs='*', metavar='FILTER', default=[],
@@ -80,6 +282,45 @@ def get_arguments():
         help='Write the output to stdout. Not all writers can write to stdout '
              'Cannot be used with `output`.'
     )
+    parser.add_argument(
+        '-j', '--jobs', type=int, metavar='N',
+        help='Number of worker processes used when converting many files, '
+             'or to analyse a single file. Defaults to the number of CPUs '
+             'when converting many files, and to 1 otherwise.'
+    )
+    parser.add_argument(
+        '--cache', metavar='DIRECTORY',
+        help='Directory where the results of the analysis of the input files '
+             'are cached, so that converting the same file again (e.g. with '
+             'other filters or writer) is faster.'
+    )
+    parser.add_argument(
+        '--checkpoint', type=float, metavar='SECONDS',
+        help='Save the progress of the analysis of each input file every '
+             'SECONDS seconds in a file next to it (named after it, with a '
+             '.checkpoint.npz extension), so that if the conversion is '
+             'interrupted, running it again resumes the analysis where it '
+             'stopped. Cannot be used with `jobs` for a single input file.'
+    )
+    parser.add_argument(
+        '--checkpoint-dir', metavar='DIRECTORY',
+        help='Directory where the checkpoints of the `checkpoint` option are '
+             'saved, instead of next to the input files (e.g. when their '
+             'directory is read-only).'
+    )
+
+    parser.add_argument(
+        '--profile', action='store_true',
+        help='Print the time spent in each stage of the conversion (and the '
+             'number of windows and pairs it processed and its peak memory '
+             'usage) on stderr. With `cache`, the hits and misses of the '
+             'cache are also printed.'
+    )
+    parser.add_argument(
+        '--profile-format', choices=['table', 'json'],
+        help='Print the statistics of the `profile` option as a table (the '
+             'default) or as a JSON object. Implies `profile`.'
+    )
 
     return parser.parse_args()
 
@@ -92,9 +333,16 @@ def handle_error(*messages):
     sys.exit(1)
 
 
+def show_warning(message, category, filename, lineno, file=None,
+                 line=None):
+    """Print the warnings on stderr, without their location"""
+    sys.stderr.write('Warning: {}\n'.format(message))
+
+
 def run():
 
     args = get_arguments()
+    warnings.showwarning = show_warning
 
     if args.conf:
         try:
@@ -104,27 +352,120 @@ def run():
             handle_error('Cannot read configuration file',
                          'Got error: "{}"'.format(e))
 
-        filters_names = conf.get('filters', [])
-        filters_to_use = [getattr(filters, fltr) for fltr in filters_names]
+        # Either a list of outputs, or the options of a single output
+        outputs = conf.get('outputs', [conf])
+        outputs = [{
+            'writer': output.get('writer'),
+            'filters': [getattr(filters, fltr)
+                        for fltr in output.get('filters', [])],
+            'output': output.get('output'),
+            'stdout': output.get('stdout', False),
+            'writer_options': output.get('writer_options'),
+            'filters_kwargs': output.get('filters_kwargs'),
+        } for output in outputs]
 
-        writer = conf.get('writer')
-        output = conf.get('output')
-        stdout = conf.get('stdout', False)
+        jobs = conf.get('jobs')
+        cache_dir = conf.get('cache')
+        checkpoint_interval = conf.get('checkpoint')
+        checkpoint_dir = conf.get('checkpoint_dir')
+        profile = conf.get('profile')
 
     else:
         filters_to_use = [getattr(filters, fltr) for fltr in args.filters]
-        writer = args.writer
-        output = args.output
-        stdout = args.stdout
+        if args.output and args.writer and len(args.writer) > 1:
+            handle_error('Cannot specify `outfile` option with more than one '
+                         'writer')
+        outputs = [{
+            'writer': writer,
+            'filters': filters_to_use,
+            'output': args.output,
+            'stdout': args.stdout,
+        } for writer in args.writer or [None]]
+
+        jobs = args.jobs
+        cache_dir = args.cache
+        checkpoint_interval = args.checkpoint
+        checkpoint_dir = args.checkpoint_dir
+        profile = None
+        if args.profile or args.profile_format:
+            profile = args.profile_format or 'table'
+
+    for output in outputs:
+        if output['writer'] is None or output['writer'] not in VALID_WRITERS:
+            handle_error('Invalid writer specified. Valid choices are:',
+                         ', '.join(VALID_WRITERS))
+
+        if output['stdout'] and output['output']:
+            handle_error('Cannot specify both `outfile` and `stdout` options')
+
+    if len([output for output in outputs if output['stdout']]) > 1:
+        handle_error('Cannot write more than one output to stdout')
+
+    infiles = get_input_files(args.infile)
+    if not infiles:
+        handle_error('No input files found in: ' + ', '.join(args.infile))
+    if len(infiles) > 1:
+        if any(output['stdout'] or output['output'] for output in outputs):
+            handle_error('Cannot specify `outfile` or `stdout` options with '
+                         'more than one input file')
+        if profile:
+            handle_error('Cannot specify `profile` option with more than one '
+                         'input file')
+        run_many(infiles, outputs, jobs, cache_dir, checkpoint_interval,
+                 checkpoint_dir)
+        return
 
-    if writer is None or writer not in VALID_WRITERS:
-        handle_error('Invalid writer specified. Valid choices are:',
-                     ', '.join(VALID_WRITERS))
+    if checkpoint_interval is not None and jobs not in (None, 1):
+        handle_error('Cannot specify both `jobs` and `checkpoint` options '
+                     'with a single input file')
 
-    if stdout and output:
-        handle_error('Cannot specify both `outfile` and `stdout` options')
+    from .gazouilli import GazouilliException
+    from .profiling import Profiler
 
+    profiler = Profiler() if profile else None
     try:
-        convert(args.infile, writer, filters_to_use, output, stdout)
+        convert_outputs(infiles[0], outputs, jobs or 1, cache_dir, profiler,
+                        checkpoint_interval, checkpoint_dir)
     except GazouilliException as e:
-        handle_error(e.message)
+        handle_error(str(e))
+    finally:
+        if profiler is not None:
+            profiler.stop()
+
+    if profile == 'json':
+        sys.stderr.write(profiler.to_json() + '\n')
+    elif profile:
+        sys.stderr.write(profiler.format_table())
+
+
+def run_many(infiles, outputs, jobs, cache_dir, checkpoint_interval=None,
+             checkpoint_dir=None):
+    """Convert all the `infiles`, report the failures and a summary of the
+    throughput (and of the hits and misses of the cache, if any) on stderr,
+    and exit with code 1 if any conversion failed.
+    """
+    start = time.time()
+    results = convert_many(infiles, outputs, jobs, cache_dir,
+                           checkpoint_interval, checkpoint_dir)
+    elapsed = time.time() - start
+
+    failures = [(infile, error) for infile, _, error, _ in results if error]
+    for infile, error in failures:
+        sys.stderr.write('Error: {}: {}\n'.format(infile, error))
+
+    audio_seconds = sum(seconds for _, seconds, _, _ in results)
+    sys.stderr.write(
+        'Converted {} of {} files ({:.1f}s of audio) in {:.1f}s: '
+        '{:.1f} audio-seconds per second\n'.format(
+            len(results) - len(failures), len(results), audio_seconds,
+            elapsed, audio_seconds / elapsed if elapsed else 0.0)
+    )
+
+    cache_stats = [stats for _, _, _, stats in results if stats is not None]
+    if cache_stats:
+        sys.stderr.write('Cache: {} hits, {} misses\n'.format(
+            sum(stats['hits'] for stats in cache_stats),
+            sum(stats['misses'] for stats in cache_stats)))
+
+    if failures:
+        sys.exit(1)
@@ -1,12 +1,23 @@
 """
 Filters for output of wave form analysis.
 
-The input for the filter functions should be a list of pairs (n, d) At first
-`n` denotes the MIDI note number and `d` the duration in seconds, but the
-filters can change the meaning of these, as long as the output is another list
-of pairs (the functions should be composable with one another).
+The input for the filter functions should be an iterable of pairs (n, d). At
+first `n` denotes the MIDI note number and `d` the duration in seconds, but the
+filters can change the meaning of these, as long as the output is another
+iterable of pairs (the functions should be composable with one another).
+
+When given an iterator, the filters return generators that only look at as
+many pairs as they need, so that they can be applied to a stream of pairs as
+it is being produced. When given a list (or tuple) of pairs, they return a
+list, and when given a `NoteSequence`, another `NoteSequence` computed from
+its arrays.
+
+The filters import numpy (and the notes module) only when they are applied,
+so that their names can be listed (e.g. by the command line) without it.
 """
 
+import collections
+
 
 __all__ = [
     'weed_out_short_notes',
@@ -17,11 +28,18 @@ __all__ = [
 
 def weed_out_short_notes(pairs, **kwargs):
     """Remove notes from pairs whose duration are smaller than the threshold"""
+    from .notes import NoteSequence
+
     duration_threshold = kwargs.get('duration_threshold', 0.25)
-    return [(n, d) for (n, d) in pairs if d > duration_threshold]
+
+    if isinstance(pairs, NoteSequence):
+        keep = pairs.durations > duration_threshold
+        return NoteSequence(pairs.notes[keep], pairs.durations[keep])
+
+    return like_input(
+        pairs, ((n, d) for (n, d) in pairs if d > duration_threshold))
 
 
-# TODO: make this more pythonic?
 def absorb_short_notes(pairs, **kwargs):
     """
     If a note with a short duration appears between two of the same notes,
@@ -33,39 +51,113 @@ def absorb_short_notes(pairs, **kwargs):
     alternation of two notes) into a single long note.
 
     Example:
-        >>> absorb_short_notes([(95, 2), (96, 1), (95, 8), (92, 6)], {})
+        >>> absorb_short_notes([(95, 2), (96, 1), (95, 8), (92, 6)],
+        ...                    duration_threshold=2)
         [(95, 11), (92, 6)]
     """
+    from .notes import NoteSequence
 
     duration_threshold = kwargs.get('duration_threshold', 0.25)
 
-    result = []
-    i = 0
-    while i < len(pairs):
-        pair = pairs[i]
-        n, d = pair
-        try:
-            n1, d1 = pairs[i + 1]
-            n2, d2 = pairs[i + 2]
-        except IndexError:
-            if d > duration_threshold:
-                result.append(pair)
-            i += 1
+    if isinstance(pairs, NoteSequence):
+        return _absorb_short_notes_arrays(pairs, duration_threshold)
+
+    return like_input(
+        pairs, _iter_absorb_short_notes(pairs, duration_threshold))
+
+
+def _iter_absorb_short_notes(pairs, duration_threshold):
+    window = collections.deque()
+    for pair in pairs:
+        window.append(pair)
+        if len(window) < 3:
             continue
 
+        (n, d), (n1, d1), (n2, d2) = window
         if n == n2 and d1 < duration_threshold:
-            new_pair = (n, d + d1 + d2)
-            result.append(new_pair)
-            i += 3
+            yield (n, d + d1 + d2)
+            window.clear()
         else:
             if d > duration_threshold:
-                result.append(pair)
-            i += 1
+                yield window[0]
+            window.popleft()
+
+    # Last pairs, which are not followed by two others
+    for pair in window:
+        if pair[1] > duration_threshold:
+            yield pair
+
+
+def _absorb_short_notes_arrays(pairs, duration_threshold):
+    import numpy as np
+    from .notes import NoteSequence
+
+    notes, durations = pairs.notes, pairs.durations
+
+    # Start of each (n, short, n) pattern
+    starts = np.flatnonzero((notes[:-2] == notes[2:]) &
+                            (durations[1:-1] < duration_threshold))
 
-    return result
+    # Patterns are merged from left to right, so a pattern starting in the
+    # middle of a merged one is ignored. This can only happen to a pattern
+    # starting right after another one, so those are the only ones that need
+    # to be checked one by one.
+    overlapping = np.flatnonzero(np.diff(starts) < 3) + 1
+    if len(overlapping):
+        selected = np.ones(len(starts), dtype=bool)
+        for i in overlapping.tolist():
+            j = i - 1
+            while not selected[j]:
+                j -= 1
+            selected[i] = starts[i] - starts[j] >= 3
+        starts = starts[selected]
+
+    merged = np.zeros(len(notes), dtype=bool)
+    merged[starts] = True
+
+    keep = durations > duration_threshold
+    keep[starts + 1] = False
+    keep[starts + 2] = False
+    keep |= merged
+
+    durations = durations.copy()
+    durations[starts] += durations[starts + 1]
+    durations[starts] += durations[starts + 2]
+
+    return NoteSequence(notes[keep], durations[keep])
 
 
 def convert_duration_to_integer(pairs, **kwargs):
+    from .notes import NoteSequence
+
     ratio = kwargs.get('ratio', 16)
 
-    return [(n, int(round(d * ratio))) for n, d in pairs]
+    if isinstance(pairs, NoteSequence):
+        durations = round_like_builtin(pairs.durations * ratio)
+        return NoteSequence(pairs.notes, durations)
+
+    return like_input(pairs, ((n, int(round(d * ratio))) for n, d in pairs))
+
+
+def like_input(pairs, output):
+    """Return the generator `output` of a filter as a list if its input
+    `pairs` is a list or tuple, or as is otherwise.
+    """
+    if isinstance(pairs, (list, tuple)):
+        return list(output)
+    return output
+
+
+def round_like_builtin(values):
+    """Round the array `values` to an array of integers, breaking ties the
+    same way as the builtin `round` function (away from zero on Python 2, to
+    the nearest even number on Python 3).
+    """
+    import numpy as np
+
+    rounded = np.rint(values)
+    if round(0.5) == 1:
+        truncated = np.trunc(values)
+        ties = np.abs(values - truncated) == 0.5
+        rounded = np.where(ties, truncated + np.sign(values), rounded)
+    return rounded.astype(np.int64)
@@ -1,11 +1,29 @@
-import array
 import contextlib
+import copy
+import itertools
+import multiprocessing
+import numbers
+import os
 import sys
+import time
+import types
+import warnings
 import wave
 
+try:
+    from math import gcd
+except ImportError:  # Python 2
+    from fractions import gcd
+
 import numpy as np
 
-from .utils import clamp, collect_consecutive_values
+from .checkpoint import Checkpoint
+from .notes import NoteSequence
+from .pitch import ESTIMATORS
+from .profiling import stage
+from .utils import (
+    STANDARD_PITCH, RunLengthEncoder, quantize, run_lengths)
+from .wavefile import SAMPLE_TYPES, DecodedSamples, WaveFile
 
 
 class GazouilliException(Exception):
@@ -15,113 +33,887 @@ class GazouilliException(Exception):
 class Gazouilli(object):
 
     def __init__(self, writer, filters=None, stream=sys.stdout,
-                 writer_options=None, filters_kwargs=None):
+                 writer_options=None, filters_kwargs=None, profiler=None):
+        """If `profiler` is a `profiling.Profiler`, the time spent in each
+        filter and in the writer is recorded in it (when the pairs are not
+        given as an iterator).
+        """
         self.writer = writer
         self.filters = filters or []
         self.stream = stream
         self.writer_options = writer_options or {}
         self.filters_kwargs = filters_kwargs or {}
+        self.profiler = profiler
 
     def filter_pairs(self, pairs):
         for fn in self.filters:
-            pairs = fn(pairs, **self.filters_kwargs)
+            pairs = apply_filter(fn, pairs, self.filters_kwargs, self.profiler)
         return pairs
 
     def convert(self, pairs, apply_filters=False):
+        """Write `pairs` to the stream using the writer. `pairs` can be any
+        iterable of (note, duration) pairs. If it is an iterator (e.g. the
+        output of `WaveReader.stream`), the pairs are given to the writer as
+        they are produced, so that the output starts before the end of the
+        analysis.
+        """
         if apply_filters:
             pairs = self.filter_pairs(pairs)
 
-        w = self.writer(pairs, **self.writer_options)
-        w.write(self.stream)
+        if isinstance(pairs, MATERIALIZED_TYPES):
+            name = 'write ' + self.writer.__name__.lower()
+            with stage(self.profiler, name, pairs_in=len(pairs)):
+                w = self.writer(pairs, **self.writer_options)
+                w.write(self.stream)
+        else:
+            w = self.begin()
+            w.feed(pairs)
+            w.finish()
+
+    def begin(self):
+        """Return an instance of the writer that has started to write to the
+        stream, and that can be fed pairs incrementally.
+        """
+        w = self.writer(**self.writer_options)
+        w.begin(self.stream)
+        return w
+
+
+# Types of the sequences of pairs whose items are all available at once
+MATERIALIZED_TYPES = (list, tuple, NoteSequence)
+
+# Maximum number of pairs given at a time to each writer by `convert_all`
+FEED_SIZE = 64
+
+
+def apply_filter(fn, pairs, kwargs, profiler=None):
+    """Return the output of the filter `fn` for `pairs`.
+
+    If `profiler` is given and `pairs` is not an iterator, the filter is
+    recorded as a stage of the profiler. Its output is then materialized, so
+    that the time spent in the filter is not deferred to its consumer.
+    """
+    if profiler is None or not isinstance(pairs, MATERIALIZED_TYPES):
+        return fn(pairs, **kwargs)
+
+    with profiler.stage(fn.__name__, pairs_in=len(pairs)) as record:
+        output = fn(pairs, **kwargs)
+        if not isinstance(output, MATERIALIZED_TYPES):
+            output = list(output)
+        record['pairs_out'] = len(output)
+    return output
+
+
+def convert_all(gazouillis, pairs, apply_filters=False):
+    """Convert the same `pairs` with each instance of `Gazouilli` in the list
+    `gazouillis`, so that a single analysis of a file can be written with many
+    writers (each one with its own filters and options).
+
+    The filters common to the start of the filter chains of many instances
+    are only applied once, and their output is shared by these instances.
+
+    If `pairs` is an iterator, the pairs are fed to all the writers together
+    as they are produced, so that they do not need to be all kept in memory.
+    """
+    chains = split_pairs(gazouillis, pairs, apply_filters)
+
+    if isinstance(pairs, MATERIALIZED_TYPES):
+        for g, chain in zip(gazouillis, chains):
+            g.convert(chain)
+        return
+
+    active = [(g.begin(), iter(chain)) for g, chain in zip(gazouillis, chains)]
+    while active:
+        for w, chain in list(active):
+            chunk = list(itertools.islice(chain, FEED_SIZE))
+            if chunk:
+                w.feed(chunk)
+            else:
+                w.finish()
+                active.remove((w, chain))
+
+
+def split_pairs(gazouillis, pairs, apply_filters=False):
+    """Return a list of the pairs to be written by each instance of
+    `Gazouilli` in `gazouillis`. If `apply_filters` is True, these are the
+    pairs filtered by the filters of each instance, where common prefixes of
+    the filter chains are only applied once.
+
+    If `pairs` is an iterator, it (or the output of the filters common to
+    many instances) is split with `itertools.tee`.
+    """
+    materialized = isinstance(pairs, MATERIALIZED_TYPES)
+    chains = [[(fn, g.filters_kwargs) for fn in g.filters] if apply_filters
+              else [] for g in gazouillis]
+    results = [None] * len(gazouillis)
+
+    def _filtered(prefix_length, members, source):
+        ending = [i for i in members if len(chains[i]) == prefix_length]
+        steps = []
+        for i in members:
+            if i not in ending and chains[i][prefix_length] not in steps:
+                steps.append(chains[i][prefix_length])
+
+        num_consumers = len(ending) + len(steps)
+        if materialized or num_consumers == 1:
+            copies = [source] * num_consumers
+        else:
+            copies = list(itertools.tee(source, num_consumers))
+
+        for i in ending:
+            results[i] = copies.pop()
+
+        for step in steps:
+            fn, kwargs = step
+            output = apply_filter(fn, copies.pop(), kwargs,
+                                  gazouillis[members[0]].profiler)
+            if materialized and not isinstance(output, MATERIALIZED_TYPES):
+                output = list(output)
+
+            _filtered(
+                prefix_length + 1,
+                [i for i in members if i not in ending and
+                 chains[i][prefix_length] == step],
+                output)
+
+    _filtered(0, list(range(len(gazouillis))), pairs)
+    return results
 
 
 class WaveReader(object):
 
-    def __init__(self, window_size=2**12, silence_threshold=10000):
+    def __init__(self, window_size=2**12, silence_threshold=10000,
+                 batch_size=256, reference_pitch=STANDARD_PITCH, jobs=1,
+                 cache=None, profiler=None, hop_size=None,
+                 window_function=None, decimation=1, pitch_estimator='argmax',
+                 checkpoint_interval=None, checkpoint_dir=None):
         """
         `window_size` is the size (in number of of samples) of the window
-        partitions used to compute the DFT.
+        partitions used to compute the DFT. It is given for files sampled at
+        `REFERENCE_FRAMERATE`: for other framerates, the window and hop sizes
+        are scaled so that the windows have the same duration (and so the
+        DFT the same frequency resolution), see `for_framerate`.
+
+        `hop_size` is the number of samples between the starts of two
+        consecutive windows, which is the time resolution of the analysis. By
+        default it is `window_size` (the windows do not overlap). A smaller
+        hop (e.g. `window_size // 4`) gives a finer time resolution without
+        losing frequency resolution. It must be a positive integer.
+
+        `window_function` is the name of the function applied to the samples
+        of each window before computing its DFT, one of `WINDOW_FUNCTIONS`
+        (by default, none is applied). The functions are scaled to have a
+        mean of 1, so that `silence_threshold` keeps the same meaning.
+
+        `decimation` is a factor by which the samples of each window are
+        low-pass filtered and downsampled before computing its DFT, which is
+        then that many times smaller (with the same frequency resolution).
+        This is faster, but only frequencies below `DECIMATION_BANDWIDTH`
+        times the new Nyquist frequency (e.g. 4.4 kHz for a factor of 4 at
+        44.1 kHz) can be found. It must divide `window_size`, which must be
+        at least as long as the decimation filter (`DECIMATION_TAPS *
+        decimation - 1` samples).
+
+        `pitch_estimator` is the function finding the frequency of each
+        window from its samples and DFT, or the name of one of the estimators
+        of `pitch.ESTIMATORS` ('argmax', 'parabolic', 'hps' or 'yin'). The
+        default, 'argmax', is only precise to the width of a DFT bin
+        (`framerate / window_size`), while the others can find low notes
+        with smaller windows. The results of other functions are only
+        cached or checkpointed if the function can be identified by its
+        module and qualified name (see `estimator_name`), so not for lambdas,
+        nested functions, `functools.partial` objects or callable instances.
 
         `silence_threshold` is the minimum value that the amplitude of the largest
         frequency in DFT output for a window must have in order to register as a
-        note.
+        note. It is given for windows of `window_size` samples: as the
+        amplitudes are proportional to the number of samples, it is scaled
+        with the window for other framerates and for decimated windows.
+
+        `batch_size` is the number of windows whose DFT are computed together
+        in a single call to numpy. Larger batches are faster, but use more
+        memory (about `16 * batch_size * window_size / 2` bytes).
+
+        `reference_pitch` is the frequency (in Hz) of the A above middle C in
+        the tuning used to round frequencies to MIDI notes.
+
+        `jobs` is the number of worker processes among which the windows of a
+        file are split by `read` (if None, one per CPU is used).
+
+        `cache` is an optional `AnalysisCache` in which `read` looks up the
+        frequencies of a file before analysing it. If they cannot be stored
+        in the cache, a `RuntimeWarning` is issued.
+
+        `profiler` is an optional `profiling.Profiler` in which the time spent
+        in each stage of the analysis is recorded.
+
+        `checkpoint_interval` is an optional number of seconds between two
+        checkpoints of the analysis of a file by `read`, which are saved in a
+        sidecar file (see `checkpoint.Checkpoint`). If the analysis of the
+        file is interrupted, the next `read` of the file resumes it from the
+        last checkpoint, with the same result as if it had not been
+        interrupted. It can only be used with `jobs=1`. If a checkpoint
+        cannot be saved, a `RuntimeWarning` is issued and the analysis goes
+        on without checkpoints.
+
+        `checkpoint_dir` is the directory in which the checkpoints are saved
+        (by default, next to each file).
         """
+        if window_function is not None and (
+                window_function not in WINDOW_FUNCTIONS):
+            raise ValueError('Unknown window function: {}'.format(
+                window_function))
+        check_decimation(window_size, decimation)
+        if hop_size is not None and (
+                not isinstance(hop_size, numbers.Integral) or hop_size <= 0):
+            raise ValueError(
+                'hop_size must be a positive integer: {!r}'.format(hop_size))
+        if not callable(pitch_estimator):
+            if pitch_estimator not in ESTIMATORS:
+                raise ValueError('Unknown pitch estimator: {}'.format(
+                    pitch_estimator))
+            pitch_estimator = ESTIMATORS[pitch_estimator]
+        estimator = estimator_name(pitch_estimator)
+        if checkpoint_interval is not None and jobs != 1:
+            raise ValueError(
+                'checkpoint_interval can only be used with jobs=1')
+
         self.window_size = window_size
+        self.hop_size = window_size if hop_size is None else hop_size
+        self.window_function = window_function
+        self.decimation = decimation
+        self.pitch_estimator = pitch_estimator
+        self.estimator_name = estimator
         self.silence_threshold = silence_threshold
+        self.batch_size = batch_size
+        self.reference_pitch = reference_pitch
+        self.jobs = jobs
+        self.cache = cache
+        self.profiler = profiler
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_dir = checkpoint_dir
 
     def read(self, infile):
-        """Given the name of a WAV file as input, returns a list of pairs
-        (note, duration) where `note` is a the number of a MIDI note and
+        """Given the name of a WAV file as input, returns a `NoteSequence` of
+        pairs (note, duration) where `note` is a the number of a MIDI note and
         `duration` is the duration of that note in seconds.
-        """
 
-        try:
-            with contextlib.closing(wave.open(infile, 'r')) as w:
-                nchannels, sampwidth, framerate, nframes, comptype, _ = w.getparams()
+        If `jobs` is not 1, the windows of the file are analysed in parallel
+        (in that case `infile` must be a filename).
 
-                if nchannels != 1:
-                    raise GazouilliException('Only mono files are supported at the moment')
-                if sampwidth != 2:
-                    raise GazouilliException('Only 16-bit files are supported at the moment')
-                if not (44000 <= framerate <= 44100):
-                    raise GazouilliException('Only 44kHz files are supported at the moment')
-                if comptype != 'NONE':
-                    raise GazouilliException('Only uncompressed files are supported')
+        If `checkpoint_interval` is set and `infile` is a filename, the
+        progress of the analysis is checkpointed (see
+        `analyse_with_checkpoints`).
+        """
 
-                raw_data = w.readframes(nframes)
+        profiler = self.profiler
+        try:
+            with stage(profiler, 'decode'):
+                data, framerate = map_samples(infile)
+            reader = self.for_framerate(framerate)
+
+            freqs = pairs = None
+            parameters = reader.analysis_parameters(framerate)
+            cache = self.cache if parameters is not None else None
+            if cache is not None:
+                with stage(profiler, 'cache lookup') as record:
+                    key = cache.key(data, parameters)
+                    freqs = cache.get(key)
+                    hit = freqs is not None
+                    record['hits' if hit else 'misses'] = 1
+
+            if freqs is None:
+                if self.jobs != 1:
+                    with stage(profiler, 'analysis',
+                               windows=reader.num_windows(len(data))):
+                        freqs = reader.get_frequencies_parallel(
+                            infile, len(data), framerate)
+                elif (self.checkpoint_interval is not None and
+                        parameters is not None and
+                        not hasattr(infile, 'read')):
+                    checkpoint = Checkpoint.for_file(
+                        infile, parameters, len(data), self.checkpoint_dir)
+                    freqs, pairs = reader.analyse_with_checkpoints(
+                        data, framerate, checkpoint)
+                else:
+                    freqs = reader.get_frequencies(data, len(data), framerate)
 
         except (IOError, wave.Error) as e:
             raise GazouilliException(
                 'Cannot read WAV file.\nGot error: "{}"'.format(e))
 
-        data = array.array('h', raw_data)
-
-        freqs = self.get_frequencies(data, nframes, framerate)
+        if cache is not None and not hit:
+            with stage(profiler, 'cache store'):
+                try:
+                    cache.put(key, freqs)
+                except (IOError, OSError) as e:
+                    warnings.warn(
+                        'Cannot store the analysis in the cache. Got error: '
+                        '"{}"'.format(e), RuntimeWarning)
 
-        pairs = self.prepare_freqs(freqs, framerate)
+        if pairs is None:
+            pairs = reader.prepare_freqs(freqs, framerate)
 
         return pairs
 
-    def get_frequencies(self, data, nframes, framerate):
-        window_size = self.window_size
-        freqs = []
+    def analyse_with_checkpoints(self, data, framerate, checkpoint):
+        """Return a pair `(freqs, pairs)` of the frequencies of the windows
+        of `data` (as given by `get_frequencies`) and of the `NoteSequence`
+        of their notes (as given by `prepare_freqs`).
+
+        The windows are analysed one batch at a time, and the frequencies
+        and runs of notes found so far are saved in `checkpoint` every
+        `checkpoint_interval` seconds. The analysis starts from the progress
+        saved in `checkpoint`, if any, and the checkpoint is removed once it
+        is complete. Since the batches are the same as those of
+        `get_frequencies`, the result is the same whether the analysis is
+        resumed or not. If the checkpoint cannot be saved, a `RuntimeWarning`
+        is issued and the analysis goes on without saving it again.
+        """
+        seconds_per_window = (1.0 / framerate) * self.hop_size
+        num_windows = self.num_windows(len(data))
+
+        state = checkpoint.load()
+        if state is None:
+            runs = (np.zeros(0, dtype=np.uint8), np.zeros(0, dtype=np.int64))
+            state = (np.zeros(0), runs, RunLengthEncoder())
+        saved_freqs, (saved_notes, saved_counts), encoder = state
+        freqs, notes, counts = [saved_freqs], [saved_notes], [saved_counts]
+
+        profiler = self.profiler
+        saving = True
+        last_save = time.time()
+        for low in range(len(saved_freqs), num_windows, self.batch_size):
+            high = min(low + self.batch_size, num_windows)
+            start = low * self.hop_size
+            end = (high - 1) * self.hop_size + self.window_size
+            batch = self.get_frequencies(data[start:end], end - start,
+                                         framerate)
+
+            with stage(profiler, 'quantize', windows=len(batch)):
+                batch_notes = quantize(batch, self.reference_pitch)
+            with stage(profiler, 'run lengths', windows=len(batch)) as record:
+                runs = encoder.feed(batch_notes)
+                record['pairs_out'] = len(runs)
+
+            freqs.append(batch)
+            if runs:
+                batch_notes, batch_counts = zip(*runs)
+                notes.append(np.array(batch_notes, dtype=np.uint8))
+                counts.append(np.array(batch_counts, dtype=np.int64))
+
+            if (saving and
+                    time.time() - last_save >= self.checkpoint_interval):
+                with stage(profiler, 'checkpoint'):
+                    freqs, notes, counts = [
+                        [np.concatenate(arrays)]
+                        for arrays in (freqs, notes, counts)]
+                    try:
+                        checkpoint.save(
+                            freqs[0], (notes[0], counts[0]), encoder)
+                    except (IOError, OSError) as e:
+                        warnings.warn(
+                            'Cannot save checkpoint {}, continuing without '
+                            'checkpoints. Got error: "{}"'.format(
+                                checkpoint.path, e), RuntimeWarning)
+                        saving = False
+                last_save = time.time()
+
+        for note, count in encoder.flush():
+            notes.append(np.array([note], dtype=np.uint8))
+            counts.append(np.array([count], dtype=np.int64))
+        checkpoint.remove()
+
+        freqs, notes, counts = [
+            np.concatenate(arrays) for arrays in (freqs, notes, counts)]
+        return freqs, NoteSequence(notes, counts * seconds_per_window)
+
+    def for_framerate(self, framerate):
+        """Return a copy of this reader whose window and hop sizes are
+        scaled for samples at `framerate`, so that they last as long as they
+        do at `REFERENCE_FRAMERATE` (or the reader itself for framerates
+        close to it). The window size is rounded to a multiple of 64 samples
+        (and of `decimation`), which the DFT handles efficiently, and the
+        silence threshold is scaled like the window size.
+
+        Raise `ValueError` if the scaled window is too small for the
+        decimation.
+        """
+        if abs(framerate - REFERENCE_FRAMERATE) <= 0.01 * REFERENCE_FRAMERATE:
+            return self
+
+        scale = framerate / float(REFERENCE_FRAMERATE)
+        multiple = 64 * self.decimation // gcd(64, self.decimation)
+        window_size = max(multiple, int(
+            round(self.window_size * scale / multiple)) * multiple)
+        if self.hop_size == self.window_size:
+            hop_size = window_size
+        else:
+            hop_size = max(1, int(round(self.hop_size * scale)))
+
+        check_decimation(window_size, self.decimation)
+
+        reader = copy.copy(self)
+        reader.window_size, reader.hop_size = window_size, hop_size
+        # The amplitudes are proportional to the number of samples
+        reader.silence_threshold = (
+            self.silence_threshold * window_size / float(self.window_size))
+        return reader
+
+    def analysis_parameters(self, framerate):
+        """Return a tuple of the parameters on which the output of
+        `get_frequencies` depends, other than the samples themselves, or None
+        if the pitch estimator cannot be identified (in which case the
+        analysis is neither cached nor checkpointed).
+        """
+        if self.estimator_name is None:
+            return None
+        return (self.window_size, self.silence_threshold, framerate,
+                self.hop_size, self.window_function, self.decimation,
+                self.estimator_name)
+
+    def output_parameters(self, framerate):
+        """Return a dictionary of the framerate, window size and hop size of
+        the analysis of samples at `framerate`, which are given to the
+        writers that record them (see `get_writer_options`).
+        """
+        reader = self.for_framerate(framerate)
+        return {
+            'framerate': framerate,
+            'window_size': reader.window_size,
+            'hop_size': reader.hop_size,
+        }
+
+    def num_windows(self, nframes):
+        """Return the number of windows analysed in `nframes` samples"""
+        if nframes < self.window_size:
+            return 0
+        return (nframes - self.window_size) // self.hop_size + 1
+
+    def stream(self, infile):
+        """Like `read`, but return an iterator yielding the (note, duration)
+        pairs as soon as they are known.
+
+        The file is read `batch_size` windows at a time, so that the memory
+        used depends on the window and batch sizes rather than on the length
+        of the recording.
+        """
 
-        # frequencies axis
-        xs = np.fft.fftfreq(window_size, 1.0 / framerate)[:window_size / 4]
+        try:
+            with contextlib.closing(open_wave_file(infile)) as w:
+                framerate = w.getframerate()
+                reader = self.for_framerate(framerate)
+                freq_batches = reader.iter_frequencies(w)
+                for pair in reader.iter_pairs(freq_batches, framerate):
+                    yield pair
 
-        for i in range(nframes / window_size):
-            low, high = i * window_size, (i + 1) * window_size
-            window = data[low:high]
+        except (IOError, wave.Error) as e:
+            raise GazouilliException(
+                'Cannot read WAV file.\nGot error: "{}"'.format(e))
 
-            if len(window) < window_size:
+    def iter_frequencies(self, w):
+        """Read the opened WAV file `w` in chunks of `batch_size` windows, and
+        yield for each chunk the array of dominant frequencies of its windows.
+        """
+        framerate = w.getframerate()
+        chunk_size = self.batch_size * self.hop_size
+
+        # Samples at the end of the previous chunk that are part of windows
+        # starting in the next one
+        tail = np.zeros(0, dtype='<i2')
+        while True:
+            data = w.read_samples(chunk_size)
+            if len(data) == 0:
                 break
+            if len(tail):
+                data = np.concatenate((tail, data))
 
-            # amplitude axis
-            ys = abs(np.fft.fft(window)[:window_size / 4])
+            freqs = self.get_frequencies(data, len(data), framerate)
+            tail = data[len(freqs) * self.hop_size:]
+            if len(freqs):
+                yield freqs
 
-            if ys.max() < self.silence_threshold:
-                freq = 0.0
-            else:
-                freq = xs[ys.argmax()]
+    def get_frequencies(self, data, nframes, framerate):
+        """Return an array containing the dominant frequency of each window
+        of `data`, or 0.0 for windows considered to be silent.
+
+        `data` can be any sequence of samples in the scale of 16-bit samples
+        (e.g. a numpy array, an `array.array` or the `DecodedSamples` returned
+        by `map_samples`). Windows are laid out as the rows of a matrix that
+        is a view on `data` (no copy is made, even when windows overlap), and
+        their DFT are computed in batches of `batch_size` windows.
+        """
+        window_size = self.window_size
+        num_windows = self.num_windows(min(nframes, len(data)))
+
+        if isinstance(data, DecodedSamples):
+            # Decode the samples of one batch of windows at a time
+            batches = []
+            for low in range(0, num_windows, self.batch_size):
+                high = min(low + self.batch_size, num_windows)
+                start = low * self.hop_size
+                end = (high - 1) * self.hop_size + window_size
+                batches.append(self.get_frequencies(
+                    data[start:end], end - start, framerate))
+            return np.concatenate(batches) if batches else np.zeros(0)
+
+        data = np.asarray(data)
+        windows = np.lib.stride_tricks.as_strided(
+            data, shape=(num_windows, window_size),
+            strides=(self.hop_size * data.strides[0], data.strides[0]),
+            writeable=False)
 
-            freqs.append(freq)
+        # frequencies axis
+        xs = frequency_axis(window_size, framerate)
+
+        # Size of the DFT, number of samples of each window given to it, and
+        # number of frequency bins kept
+        dft_size = length = window_size // self.decimation
+        num_bins = window_size // 4
+        threshold = self.silence_threshold
+        if self.decimation > 1:
+            length = decimated_length(window_size, self.decimation)
+            num_bins = min(num_bins, int(DECIMATION_BANDWIDTH * dft_size / 2))
+            # The amplitudes are proportional to the number of samples
+            threshold = threshold * length / float(window_size)
+
+        weights = None
+        if self.window_function is not None:
+            weights = window_weights(self.window_function, length)
+
+        estimator = self.pitch_estimator
+        analysis_rate = framerate / float(self.decimation)
+        axis = xs[:num_bins]
+
+        freqs = np.zeros(num_windows)
+        with stage(self.profiler, 'analysis', windows=num_windows):
+            for low in range(0, num_windows, self.batch_size):
+                batch = windows[low:low + self.batch_size]
+                if self.decimation > 1:
+                    batch = decimate(batch, self.decimation)
+                if weights is not None:
+                    batch = batch * weights
+
+                # amplitude axis, one row per window
+                ys = np.abs(
+                    np.fft.rfft(batch, dft_size, axis=1)[:, :num_bins])
+
+                if estimator is ESTIMATORS['argmax']:
+                    # Same as the estimator, without a second search of the
+                    # largest bins
+                    peaks = ys.argmax(axis=1)
+                    amplitudes = ys[np.arange(len(peaks)), peaks]
+                    estimates = xs[peaks]
+                else:
+                    amplitudes = ys.max(axis=1)
+                    estimates = estimator(batch, ys, axis, analysis_rate)
+
+                freqs[low:low + len(ys)] = np.where(
+                    amplitudes < threshold, 0.0, estimates)
 
         return freqs
 
+    def get_frequencies_parallel(self, infile, nframes, framerate):
+        """Same as `get_frequencies`, but for the samples of the WAV file
+        named `infile`. The windows are split into contiguous segments that
+        are analysed by a pool of `jobs` worker processes, each of them
+        memory-mapping the file with `map_samples`. The frequencies of the
+        segments are then concatenated in order, so the result is the same as
+        when the file is analysed sequentially.
+        """
+        num_windows = self.num_windows(nframes)
+        jobs = self.jobs or multiprocessing.cpu_count()
+        segment_size = max(self.batch_size, -(-num_windows // jobs))
+
+        # Each segment includes the samples of its last windows that overlap
+        # with the next segment
+        tasks = [
+            (self, infile, low * self.hop_size,
+             (min(low + segment_size, num_windows) - 1) * self.hop_size +
+             self.window_size)
+            for low in range(0, num_windows, segment_size)
+        ]
+        if not tasks:
+            return np.zeros(0)
+
+        pool = multiprocessing.Pool(min(jobs, len(tasks)))
+        try:
+            segments = pool.map(_segment_frequencies, tasks, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+
+        return np.concatenate(segments)
+
     def prepare_freqs(self, freqs, framerate):
-        """Convert the sequence of raw frequencies `freqs` to a list of
-        (note, duration) pairs.
+        """Convert the sequence of raw frequencies `freqs` to a `NoteSequence`
+        of (note, duration) pairs.
         """
-        seconds_per_window = (1.0 / framerate) * self.window_size
+        seconds_per_window = (1.0 / framerate) * self.hop_size
 
         # Convert frequencies to the nearest MIDI note number
-        clamped_freqs = map(clamp, freqs)
+        with stage(self.profiler, 'quantize', windows=len(freqs)):
+            notes = quantize(freqs, self.reference_pitch)
 
-        # Gather windows having the same note value together to get a list of
+        # Gather windows having the same note value together to get
         # (note, duration) pairs
-        pairs = collect_consecutive_values(clamped_freqs)
+        with stage(self.profiler, 'run lengths',
+                   windows=len(freqs)) as record:
+            notes, counts = run_lengths(notes)
+            record['pairs_out'] = len(notes)
 
         # Convert durations in number of windows to durations in seconds
-        pairs = [(n, d * seconds_per_window) for n, d in pairs]
+        return NoteSequence(notes, counts * seconds_per_window)
 
-        return pairs
+    def iter_pairs(self, freq_batches, framerate):
+        """Lazy version of `prepare_freqs` taking an iterable of arrays of
+        frequencies (as given by `iter_frequencies`): yield each
+        (note, duration) pair as soon as the run of windows making up the note
+        is over.
+        """
+        seconds_per_window = (1.0 / framerate) * self.hop_size
+
+        profiler = self.profiler
+        encoder = RunLengthEncoder()
+        for freqs in freq_batches:
+            with stage(profiler, 'quantize', windows=len(freqs)):
+                notes = quantize(freqs, self.reference_pitch)
+            with stage(profiler, 'run lengths', windows=len(freqs)) as record:
+                runs = encoder.feed(notes)
+                record['pairs_out'] = len(runs)
+            for note, count in runs:
+                yield (note, count * seconds_per_window)
+
+        for note, count in encoder.flush():
+            yield (note, count * seconds_per_window)
+
+
+# Framerate for which the window and hop sizes of `WaveReader` are given
+REFERENCE_FRAMERATE = 44100
+
+# Frequency axes of the DFT of a window, by window size and framerate
+_frequency_axes = {}
+
+
+def frequency_axis(window_size, framerate):
+    """Return the frequencies (in Hz) of the first quarter of the DFT bins of
+    a window of `window_size` samples at the given framerate. The axes are
+    computed once and then reused.
+    """
+    key = (window_size, framerate)
+    if key not in _frequency_axes:
+        xs = np.fft.fftfreq(window_size, 1.0 / framerate)[:window_size // 4]
+        xs.flags.writeable = False
+        _frequency_axes[key] = xs
+    return _frequency_axes[key]
+
+
+# Functions that can be applied to the samples of each window, by name
+WINDOW_FUNCTIONS = {
+    'hann': np.hanning,
+    'hamming': np.hamming,
+}
+
+# Weights of the window functions, by name and window size
+_window_weights = {}
+
+
+def window_weights(name, window_size):
+    """Return the weights of the window function `name` for windows of
+    `window_size` samples, scaled to have a mean of 1. The weights are
+    computed once and then reused.
+    """
+    key = (name, window_size)
+    if key not in _window_weights:
+        weights = WINDOW_FUNCTIONS[name](window_size)
+        weights /= weights.mean()
+        weights.flags.writeable = False
+        _window_weights[key] = weights
+    return _window_weights[key]
+
+
+# Fraction of the Nyquist frequency of the decimated samples below which
+# frequencies are looked for (the decimation filter attenuates the others)
+DECIMATION_BANDWIDTH = 0.8
+
+# Number of taps of the decimation filter, per unit of decimation factor
+DECIMATION_TAPS = 8
+
+# Low-pass filters used for decimation, by decimation factor
+_decimation_filters = {}
+
+
+def decimation_filter(factor):
+    """Return the coefficients of the low-pass filter applied before
+    downsampling by `factor`: a windowed sinc with a cutoff at the Nyquist
+    frequency of the downsampled samples, and a gain of 1 at 0 Hz. The
+    filters are computed once and then reused.
+    """
+    if factor not in _decimation_filters:
+        taps = DECIMATION_TAPS * factor - 1
+        n = np.arange(taps) - (taps - 1) / 2.0
+        h = np.sinc(n / factor) * np.hamming(taps)
+        h /= h.sum()
+        h.flags.writeable = False
+        _decimation_filters[factor] = h
+    return _decimation_filters[factor]
+
+
+def decimated_length(size, factor):
+    """Return the number of samples of a row of `size` samples after
+    `decimate`"""
+    return (size - len(decimation_filter(factor))) // factor + 1
+
+
+def check_decimation(window_size, factor):
+    """Raise `ValueError` if windows of `window_size` samples cannot be
+    decimated by `factor`.
+    """
+    if factor < 1:
+        raise ValueError('decimation must be a positive integer')
+    if window_size % factor:
+        raise ValueError('decimation must divide window_size')
+    if factor > 1 and window_size < DECIMATION_TAPS * factor - 1:
+        raise ValueError(
+            'window_size ({}) is too small for a decimation by {}: it must be '
+            'at least {}'.format(window_size, factor,
+                                 DECIMATION_TAPS * factor - 1))
+
+
+def decimate(frames, factor):
+    """Return the rows of the matrix `frames` low-pass filtered and
+    downsampled by `factor`. Only the samples for which the filter lies
+    entirely within a row are kept, so that each row is filtered
+    independently of the others.
+    """
+    h = decimation_filter(factor)
+    frames = np.ascontiguousarray(frames, dtype=float)
+    rows, size = frames.shape
+    row_stride, stride = frames.strides
+
+    # View of the samples under the filter for each output sample
+    taps = np.lib.stride_tricks.as_strided(
+        frames, shape=(rows, decimated_length(size, factor), len(h)),
+        strides=(row_stride, factor * stride, stride), writeable=False)
+    return np.einsum('ijk,k->ij', taps, h)
+
+
+def _segment_frequencies(task):
+    reader, infile, start, end = task
+    data, framerate = map_samples(infile)
+    return reader.get_frequencies(data[start:end], end - start, framerate)
+
+
+def estimator_name(estimator):
+    """Return the name identifying the pitch estimator `estimator` in the
+    parameters of an analysis: its name in `pitch.ESTIMATORS`, or else its
+    module and qualified name. Return None if these do not identify it
+    (e.g. for lambdas, nested functions, `functools.partial` objects and
+    callable instances).
+    """
+    for name, registered in ESTIMATORS.items():
+        if estimator is registered:
+            return name
+
+    module = getattr(estimator, '__module__', None)
+    qualname = getattr(estimator, '__qualname__', None)
+    if (module is None or qualname is None or '<' in qualname or
+            not isinstance(estimator, types.FunctionType)):
+        return None
+    return '{}.{}'.format(module, qualname)
+
+
+def get_wave_parameters(infile):
+    """Return the framerate and number of frames of the WAV file `infile`.
+
+    Raise `GazouilliException` if the file cannot be read, as for
+    `WaveReader.read`.
+    """
+    try:
+        with contextlib.closing(open_wave_file(infile)) as w:
+            return w.getframerate(), w.getnframes()
+    except (IOError, wave.Error) as e:
+        raise GazouilliException(
+            'Cannot read WAV file.\nGot error: "{}"'.format(e))
+
+
+def get_writer_options(writer, reader, infile, writer_options=None):
+    """Return the options with which `writer` is created to write the pairs
+    of the WAV file `infile` read by the `WaveReader` instance `reader`.
+
+    These are `writer_options`, completed with the parameters of the
+    analysis (see `WaveReader.output_parameters`) for the writers with a true
+    `takes_analysis_parameters` attribute. If `infile` is a file object, only
+    its header is read, and it is then moved back to where it was.
+    """
+    if not getattr(writer, 'takes_analysis_parameters', False):
+        return writer_options
+
+    if hasattr(infile, 'read'):
+        position = infile.tell()
+        framerate, _ = get_wave_parameters(infile)
+        infile.seek(position)
+    else:
+        framerate, _ = get_wave_parameters(infile)
+    return dict(reader.output_parameters(framerate), **(writer_options or {}))
+
+
+def map_samples(infile):
+    """Return a pair `(samples, framerate)` where `samples` is a read-only
+    array-like sequence of the mono samples of the WAV file `infile`, in the
+    scale of 16-bit samples.
+
+    If `infile` is a filename, the frames of the file are memory-mapped, so
+    that no sample is read until it is accessed and slices of the array do
+    not copy any data. Otherwise `infile` is read as a file object, and the
+    frames are a view on the bytes that were read. For 16-bit mono files,
+    `samples` is the array of frames itself, otherwise it is a
+    `DecodedSamples` decoding the frames as they are accessed.
+    """
+    with contextlib.closing(open_wave_file(infile)) as w:
+        sample_format = w.format
+        if hasattr(infile, 'read'):
+            frames = sample_format.frames(w.readframes(w.getnframes()))
+        else:
+            offset, nframes = w.data_offset, w.getnframes()
+
+    if not hasattr(infile, 'read'):
+        # The size of the data chunk can be larger than the file if it was
+        # not known when the file was written
+        nframes = min(nframes, (os.path.getsize(infile) - offset) //
+                      sample_format.frame_size)
+        if nframes == 0:
+            # an empty file cannot be memory-mapped
+            frames = np.zeros((0,) + sample_format.frame_shape(),
+                              dtype=sample_format.sample_type)
+        else:
+            frames = np.memmap(
+                infile, dtype=sample_format.sample_type, mode='r',
+                offset=offset,
+                shape=(nframes,) + sample_format.frame_shape())
+
+    if sample_format.is_native:
+        return sample_format.decode(frames), sample_format.framerate
+    return DecodedSamples(frames, sample_format), sample_format.framerate
+
+
+def open_wave_file(infile):
+    """Open the WAV file `infile` for reading (as a `wavefile.WaveFile`), and
+    check that its format is supported.
+    """
+    w = WaveFile(infile)
+    sample_format = w.format
+
+    try:
+        if (sample_format.format_tag, sample_format.sampwidth) not in (
+                SAMPLE_TYPES):
+            raise GazouilliException(
+                'Only uncompressed files of 8, 16, 24 or 32-bit integer or '
+                '32 or 64-bit floating point samples are supported')
+        if sample_format.framerate < 1:
+            raise GazouilliException('Invalid framerate')
+    except GazouilliException:
+        w.close()
+        raise
+
+    return w
@@ -0,0 +1,67 @@
+import numpy as np
+
+
+class NoteSequence(object):
+    """Sequence of (note, duration) pairs stored as two parallel arrays.
+
+    This is what `WaveReader` returns: it behaves like a list of pairs (it can
+    be iterated over, indexed, sliced and compared to a list of pairs), but it
+    only uses a few bytes per pair, and filters and writers can work on the
+    `notes` and `durations` arrays directly.
+    """
+
+    def __init__(self, notes, durations):
+        """
+        `notes` is an array of MIDI note numbers, stored as unsigned bytes.
+
+        `durations` is an array of the same length containing the duration of
+        each note, usually in seconds (as floats), but filters can convert
+        them to other units (e.g. as integers).
+        """
+        self.notes = np.asarray(notes, dtype=np.uint8)
+        self.durations = np.asarray(durations)
+        if self.durations.dtype.kind not in 'iuf':
+            self.durations = self.durations.astype(np.float64)
+
+        if len(self.notes) != len(self.durations):
+            raise ValueError('notes and durations must have the same length')
+
+    @classmethod
+    def from_pairs(cls, pairs):
+        """Build a sequence from an iterable of (note, duration) pairs"""
+        pairs = list(pairs)
+        if not pairs:
+            return cls([], np.zeros(0))
+        notes, durations = zip(*pairs)
+        return cls(notes, durations)
+
+    def tolist(self):
+        """Return the sequence as a list of (note, duration) tuples"""
+        return list(zip(self.notes.tolist(), self.durations.tolist()))
+
+    def __iter__(self):
+        return iter(zip(self.notes.tolist(), self.durations.tolist()))
+
+    def __len__(self):
+        return len(self.notes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return NoteSequence(self.notes[index], self.durations[index])
+        return (self.notes[index].item(), self.durations[index].item())
+
+    def __eq__(self, other):
+        if isinstance(other, NoteSequence):
+            return (np.array_equal(self.notes, other.notes) and
+                    np.array_equal(self.durations, other.durations))
+        try:
+            return self.tolist() == [tuple(pair) for pair in other]
+        except TypeError:
+            return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __repr__(self):
+        return 'NoteSequence({!r})'.format(self.tolist())
@@ -0,0 +1,152 @@
+"""
+Estimators of the pitch of windows of samples.
+
+An estimator is a function `estimator(frames, ys, xs, framerate)` where
+`frames` is a matrix whose rows are the samples of the windows (as given to
+the DFT), `ys` is a matrix whose rows are the amplitudes of the first
+frequency bins of their DFT, `xs` is the frequency (in Hz) of each of these
+bins, and `framerate` is the sample rate of `frames`. It returns an array of
+the estimated fundamental frequency of each window.
+
+Whether a window is silent is decided by `WaveReader`, from the amplitude of
+the largest bin of `ys`, so all the estimators agree on silences.
+"""
+
+import numpy as np
+
+
+def argmax(frames, ys, xs, framerate):
+    """Frequency of the bin with the largest amplitude. Its precision is the
+    width of a bin (`framerate / window_size`).
+    """
+    return xs[ys.argmax(axis=1)]
+
+
+def parabolic(frames, ys, xs, framerate):
+    """Frequency of the peak of the parabola going through the logarithms of
+    the amplitudes of the largest bin and its two neighbours, which is a
+    fraction of a bin more precise than `argmax`.
+    """
+    return interpolate_peaks(ys, ys.argmax(axis=1), xs)
+
+
+def harmonic_product(frames, ys, xs, framerate, harmonics=4,
+                     min_fundamental=0.1):
+    """Harmonic product spectrum: frequency of the bin maximizing the product
+    of the amplitudes at its first `harmonics` multiples, refined with
+    `parabolic`. It is less likely than `argmax` to pick a harmonic instead
+    of the fundamental, but only finds frequencies below
+    `xs[-1] / harmonics`.
+
+    Sounds with few harmonics (e.g. pure sines) have spurious products at
+    their subharmonics, so a bin whose amplitude is less than
+    `min_fundamental` times that of the largest bin is not taken as the
+    fundamental (the largest bin is used instead).
+    """
+    num_bins = ys.shape[1] // harmonics
+    logs = np.log(ys + 1e-12)
+
+    product = logs[:, :num_bins].copy()
+    for h in range(2, harmonics + 1):
+        product += logs[:, ::h][:, :num_bins]
+
+    # The DC bin is not a fundamental
+    peaks = product[:, 1:].argmax(axis=1) + 1
+
+    rows = np.arange(len(peaks))
+    largest = ys.argmax(axis=1)
+    weak = ys[rows, peaks] < min_fundamental * ys[rows, largest]
+    peaks = np.where(weak, largest, peaks)
+
+    return interpolate_peaks(ys, peaks, xs)
+
+
+def yin(frames, ys, xs, framerate, threshold=0.1):
+    """YIN estimator, computed for all the windows at once: the period is the
+    first lag where the cumulative mean normalized difference function drops
+    below `threshold` (or its minimum if it never does), refined by
+    parabolic interpolation. It works in the time domain, so its precision
+    does not depend on the width of the bins. Periods longer than half a
+    window are not looked for.
+    """
+    frames = np.asarray(frames, dtype=float)
+    num_windows, size = frames.shape
+    max_lag = size // 2
+    min_lag = max(2, int(framerate / xs[-1]))
+    if num_windows == 0 or max_lag <= min_lag + 1:
+        return np.zeros(num_windows)
+
+    # Autocorrelation of each window up to `max_lag`, through the DFT of the
+    # window padded with zeros (so that it is not circular)
+    spectrum = np.fft.rfft(frames, 2 * size, axis=1)
+    autocorrelation = np.fft.irfft(
+        spectrum.real ** 2 + spectrum.imag ** 2, axis=1)[:, :max_lag]
+
+    # Difference function: sum of (x[j] - x[j + lag]) ** 2 over the samples
+    # where both are in the window
+    energy = np.cumsum(frames ** 2, axis=1)
+    lags = np.arange(max_lag)
+    head = energy[:, size - 1 - lags]
+    tail = energy[:, -1:] - np.concatenate(
+        (np.zeros((num_windows, 1)), energy[:, :max_lag - 1]), axis=1)
+    difference = head + tail - 2 * autocorrelation
+    difference[:, 0] = 0.0
+
+    # Cumulative mean normalized difference
+    cumulative = np.cumsum(difference[:, 1:], axis=1)
+    normalized = np.ones_like(difference)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        normalized[:, 1:] = difference[:, 1:] * lags[1:] / cumulative
+    normalized[~np.isfinite(normalized)] = 1.0
+    normalized[:, :min_lag] = np.inf
+
+    # First lag below the threshold, followed to the bottom of its dip
+    below = normalized < threshold
+    first = np.where(below.any(axis=1), below.argmax(axis=1),
+                     normalized.argmin(axis=1))
+    rising = np.zeros_like(below)
+    rising[:, :-1] = normalized[:, 1:] > normalized[:, :-1]
+    rising &= lags >= first[:, np.newaxis]
+    periods = np.where(rising.any(axis=1), rising.argmax(axis=1), first)
+
+    # Parabolic interpolation of the dip
+    periods = np.clip(periods, 1, max_lag - 2)
+    rows = np.arange(num_windows)
+    left = normalized[rows, periods - 1]
+    center = normalized[rows, periods]
+    right = normalized[rows, periods + 1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shift = 0.5 * (left - right) / (left - 2 * center + right)
+        shift[~np.isfinite(shift) | (np.abs(shift) > 1)] = 0.0
+
+    return framerate / (periods + shift)
+
+
+def interpolate_peaks(ys, peaks, xs):
+    """Return the frequencies of the `peaks` (an array containing the index of
+    a bin of each row of `ys`) refined by fitting a parabola through the
+    logarithms of the amplitudes of each peak and its two neighbours.
+    """
+    num_bins = ys.shape[1]
+    rows = np.arange(len(peaks))
+    inner = np.clip(peaks, 1, num_bins - 2)
+
+    logs = np.log(np.stack([ys[rows, inner - 1], ys[rows, inner],
+                            ys[rows, inner + 1]]) + 1e-12)
+    left, center, right = logs
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shift = 0.5 * (left - right) / (left - 2 * center + right)
+        shift[~np.isfinite(shift) | (inner != peaks) |
+              (np.abs(shift) > 1)] = 0.0
+
+    bin_width = xs[1] - xs[0] if len(xs) > 1 else 0.0
+    return xs[peaks] + shift * bin_width
+
+
+# Pitch estimators, by name
+ESTIMATORS = {
+    'argmax': argmax,
+    'parabolic': parabolic,
+    'hps': harmonic_product,
+    'yin': yin,
+}
@@ -0,0 +1,140 @@
+"""
+Instrumentation of the stages of a conversion.
+
+A `Profiler` can be given to `WaveReader` and `Gazouilli`, which then record
+for each stage of the conversion (analysis of the windows, conversion to
+notes, each filter, the writer) the time spent in it, the number of items it
+processed and its peak memory usage. The lookups in an `AnalysisCache` are
+recorded as the stage 'cache lookup', with the number of hits and misses.
+
+The memory allocations are traced with `tracemalloc` from the first stage
+recorded by a profiler until its `stop` method is called (or the end of the
+`with` block using it), which makes the program slower in between.
+"""
+
+import collections
+import contextlib
+import json
+import time
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+
+class Profiler(object):
+
+    def __init__(self, trace_memory=True):
+        """If `trace_memory` is True, the peak memory allocated during each
+        stage is recorded (this requires Python 3.9 or later, and makes the
+        conversion slower).
+        """
+        self.stages = collections.OrderedDict()
+        self.trace_memory = (trace_memory and tracemalloc is not None and
+                             hasattr(tracemalloc, 'reset_peak'))
+        self.started_tracing = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+        return False
+
+    def stop(self):
+        """Stop tracing the memory allocations, if this profiler started it.
+        Stages recorded afterwards start tracing them again.
+        """
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    @contextlib.contextmanager
+    def stage(self, name, **counts):
+        """Context manager recording the time spent in the stage `name`.
+
+        It returns a dictionary to which counts of items processed by the
+        stage can be added (and which initially contains `counts`). When a
+        stage is recorded many times, its times and counts are summed.
+        """
+        record = dict(counts)
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.started_tracing = True
+            tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+
+        start = time.time()
+        try:
+            yield record
+        finally:
+            elapsed = time.time() - start
+
+            stats = self.stages.setdefault(name, collections.OrderedDict(
+                [('seconds', 0.0), ('calls', 0), ('peak_memory', None)]))
+            stats['seconds'] += elapsed
+            stats['calls'] += 1
+            for key, value in record.items():
+                stats[key] = stats.get(key, 0) + value
+
+            if self.trace_memory:
+                _, peak = tracemalloc.get_traced_memory()
+                stats['peak_memory'] = max(stats['peak_memory'] or 0,
+                                           peak - baseline)
+
+    def as_dict(self):
+        """Return the recorded statistics as a dictionary mapping the name of
+        each stage to its statistics.
+        """
+        return collections.OrderedDict(
+            (name, dict(stats)) for name, stats in self.stages.items())
+
+    def to_json(self):
+        return json.dumps(self.as_dict())
+
+    def format_table(self):
+        """Return the recorded statistics as a human-readable table"""
+        columns = ['seconds', 'calls', 'windows', 'pairs_in', 'pairs_out',
+                   'hits', 'misses', 'peak_memory']
+        rows = [['stage'] + columns]
+        for name, stats in self.stages.items():
+            rows.append([name] + [format_value(key, stats.get(key))
+                                  for key in columns])
+
+        widths = [max(len(row[i]) for row in rows)
+                  for i in range(len(rows[0]))]
+        lines = ['  '.join([row[0].ljust(widths[0])] +
+                           [cell.rjust(width)
+                            for cell, width in zip(row[1:], widths[1:])])
+                 for row in rows]
+        return '\n'.join(lines) + '\n'
+
+
+def format_value(key, value):
+    if value is None:
+        return '-'
+    if key == 'seconds':
+        return '{:.4f}'.format(value)
+    if key == 'peak_memory':
+        return '{:.1f} MB'.format(value / 1e6)
+    return str(value)
+
+
+class _NullStage(object):
+
+    def __enter__(self):
+        return {}
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+def stage(profiler, name, **counts):
+    """Return `profiler.stage(name, **counts)`, or a context manager doing
+    nothing if `profiler` is None.
+    """
+    if profiler is None:
+        return _NullStage()
+    return profiler.stage(name, **counts)
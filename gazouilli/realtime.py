@@ -0,0 +1,295 @@
+"""
+Real-time pitch tracking of a live stream of raw audio.
+
+The stream (e.g. stdin, fed by `arecord -t raw -f S16_LE -c 1`) contains
+16-bit little-endian mono samples without any header. It is read in hops of
+`hop_size` samples, and after each hop the dominant frequency of the last
+`window_size` samples is computed, so that a change of note is reported at
+most one hop after it happens.
+
+The events are tuples `(kind, note, time, received)` where `kind` is either
+`NOTE_ON` or `NOTE_OFF`, `time` is the position in the stream (in seconds) of
+the end of the hop where the note changed, and `received` is the time (as
+given by `time.time()`) at which this hop was read.
+"""
+
+import argparse
+import collections
+import json
+import sys
+import threading
+import time
+
+try:
+    import queue
+except ImportError:  # Python 2
+    import Queue as queue
+
+import numpy as np
+
+from .gazouilli import REFERENCE_FRAMERATE, WaveReader
+from .utils import LATENCY_HISTORY, percentile, quantize
+
+
+NOTE_ON = 'note_on'
+NOTE_OFF = 'note_off'
+
+
+class LiveReader(object):
+
+    def __init__(self, reader=None, hop_size=1024,
+                 framerate=REFERENCE_FRAMERATE, max_pending=16,
+                 drop_overruns=False):
+        """
+        `reader` is the `WaveReader` whose window size (scaled for
+        `framerate`), silence threshold and other analysis parameters are
+        used.
+
+        `hop_size` is the number of samples read between two analyses. It
+        must be positive and not larger than the window size.
+
+        `framerate` is the number of samples per second of the stream.
+
+        `max_pending` is the maximum number of hops read but not analysed yet.
+        When the analysis falls further behind the input, the hops that are
+        read are counted in `overruns`, and the reading waits for the
+        analysis to catch up, so that all the input is analysed (which is
+        what is needed for input faster than real time, e.g. a file piped
+        into stdin).
+
+        If `drop_overruns` is True, these hops are dropped instead, so that
+        the latency stays bounded when the input is live. The samples around
+        a dropped hop are then analysed as if they were contiguous.
+        """
+        self.reader = (reader or WaveReader()).for_framerate(framerate)
+        if hop_size <= 0:
+            raise ValueError('hop_size must be positive')
+        if hop_size > self.reader.window_size:
+            raise ValueError('hop_size must not be larger than window_size')
+
+        self.hop_size = hop_size
+        self.framerate = framerate
+        self.max_pending = max_pending
+        self.drop_overruns = drop_overruns
+
+        self.hops = 0
+        self.overruns = 0
+        self.latencies = collections.deque(maxlen=LATENCY_HISTORY)
+
+    def events(self, stream):
+        """Read the samples of the binary file object `stream` until it ends,
+        and yield the note on and note off events.
+        """
+        window_size = self.reader.window_size
+        ring = np.zeros(window_size, dtype='<i2')
+        pos = 0
+        current = 0
+        position = 0
+
+        hops = queue.Queue(self.max_pending)
+        errors = []
+        thread = threading.Thread(
+            target=self._read_hops, args=(stream, hops, errors))
+        thread.daemon = True
+        thread.start()
+
+        while True:
+            item = hops.get()
+            if item is None:
+                break
+            hop, received, position = item
+            self.hops += 1
+
+            # Write the hop over the oldest samples of the ring buffer
+            end = pos + len(hop)
+            if end <= window_size:
+                ring[pos:end] = hop
+            else:
+                ring[pos:] = hop[:window_size - pos]
+                ring[:end - window_size] = hop[window_size - pos:]
+            pos = end % window_size
+
+            window = np.concatenate((ring[pos:], ring[:pos]))
+            freqs = self.reader.get_frequencies(
+                window, window_size, self.framerate)
+            note = int(quantize(freqs, self.reader.reference_pitch)[0])
+
+            if note != current:
+                seconds = position / float(self.framerate)
+                if current:
+                    yield (NOTE_OFF, current, seconds, received)
+                if note:
+                    yield (NOTE_ON, note, seconds, received)
+                current = note
+
+        if errors:
+            raise errors[0]
+        if current:
+            yield (NOTE_OFF, current, position / float(self.framerate),
+                   time.time())
+
+    def _read_hops(self, stream, hops, errors):
+        # Run in a separate thread, so that the input keeps being read while
+        # a hop is analysed.
+        hop_bytes = 2 * self.hop_size
+        position = 0
+        try:
+            while True:
+                data = stream.read(hop_bytes)
+                if len(data) < hop_bytes:
+                    break
+                position += self.hop_size
+                item = (np.frombuffer(data, dtype='<i2'), time.time(),
+                        position)
+                try:
+                    hops.put_nowait(item)
+                except queue.Full:
+                    self.overruns += 1
+                    if not self.drop_overruns:
+                        hops.put(item)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            hops.put(None)
+
+    def follow(self, stream, writer):
+        """Give each event of `stream` to `writer` (an `EventWriter`) as soon
+        as it is known, and record the time between the reading of the hop
+        where it happened and the end of its writing.
+        """
+        for event in self.events(stream):
+            writer.write_event(event)
+            self.latencies.append(time.time() - event[3])
+
+    def stats(self):
+        """Return a dictionary of statistics about the events followed.
+
+        The latencies do not include the duration of a hop (`hop_seconds`),
+        which is the delay before the first sample of a hop is analysed.
+        """
+        latencies = sorted(self.latencies)
+        return {
+            'hops': self.hops,
+            'overruns': self.overruns,
+            'hop_seconds': self.hop_size / float(self.framerate),
+            'latency': dict(
+                ('p{}'.format(p), percentile(latencies, p))
+                for p in (50, 90, 99)
+            ),
+        }
+
+
+class EventWriter(object):
+    """Base class for writers of note events, which are written (and
+    flushed) one at a time as they are given.
+    """
+
+    def __init__(self, fp):
+        self.fp = fp
+
+    def write_event(self, event):
+        raise NotImplementedError
+
+
+class JsonLinesEventWriter(EventWriter):
+    """Write each event as a JSON object on its own line, to a text stream"""
+
+    def write_event(self, event):
+        kind, note, seconds, _ = event
+        self.fp.write(json.dumps(
+            {'event': kind, 'note': note, 'time': round(seconds, 6)}) + '\n')
+        self.fp.flush()
+
+
+class MidiEventWriter(EventWriter):
+    """Write each event as a raw MIDI message (without timing information, as
+    sent to a MIDI device), to a binary stream.
+    """
+
+    def __init__(self, fp, velocity=127, channel=0):
+        super(MidiEventWriter, self).__init__(fp)
+        self.velocity = velocity
+        self.channel = channel
+
+    def write_event(self, event):
+        kind, note, _, _ = event
+        if kind == NOTE_ON:
+            message = [0x90 | self.channel, note, self.velocity]
+        else:
+            message = [0x80 | self.channel, note, 0]
+        self.fp.write(bytearray(message))
+        self.fp.flush()
+
+
+EVENT_WRITERS = {
+    'json': JsonLinesEventWriter,
+    'midi': MidiEventWriter,
+}
+
+
+def get_arguments():
+    """Create an arguments parser and return the parsed arguments from
+    sys.argv"""
+
+    parser = argparse.ArgumentParser(
+        description='Track the notes of raw 16-bit mono audio read from '
+                    'stdin, and write note on and note off events to stdout.')
+    parser.add_argument(
+        '-w', '--writer', choices=sorted(EVENT_WRITERS), default='json',
+        help='Format of the events: JSON objects (one per line) or raw MIDI '
+             'messages.'
+    )
+    parser.add_argument(
+        '-r', '--framerate', type=int, default=REFERENCE_FRAMERATE,
+        help='Number of samples per second of the input.'
+    )
+    parser.add_argument(
+        '--window-size', type=int, default=2**12, metavar='SAMPLES',
+        help='Number of samples analysed to find the current note, at '
+             '44.1 kHz (it is scaled for other framerates).'
+    )
+    parser.add_argument(
+        '--hop-size', type=int, default=1024, metavar='SAMPLES',
+        help='Number of samples read between two analyses. The latency of '
+             'the events is about the duration of a hop.'
+    )
+    parser.add_argument(
+        '--drop-overruns', action='store_true',
+        help='Drop the hops read while the analysis is behind the input, so '
+             'that the latency stays bounded for live input. By default, the '
+             'reading of the input waits for the analysis instead.'
+    )
+    parser.add_argument(
+        '--stats', action='store_true',
+        help='Print statistics about the latency of the events and the '
+             'number of overruns on stderr at the end of the input.'
+    )
+
+    return parser.parse_args()
+
+
+def run():
+
+    args = get_arguments()
+
+    try:
+        live = LiveReader(WaveReader(window_size=args.window_size),
+                          hop_size=args.hop_size, framerate=args.framerate,
+                          drop_overruns=args.drop_overruns)
+    except ValueError as e:
+        sys.stderr.write('Error: {}\n'.format(e))
+        sys.exit(1)
+
+    stdin = getattr(sys.stdin, 'buffer', sys.stdin)
+    if args.writer == 'midi':
+        stdout = getattr(sys.stdout, 'buffer', sys.stdout)
+    else:
+        stdout = sys.stdout
+
+    try:
+        live.follow(stdin, EVENT_WRITERS[args.writer](stdout))
+    except KeyboardInterrupt:
+        pass
+
+    if args.stats:
+        sys.stderr.write(json.dumps(live.stats()) + '\n')
@@ -0,0 +1,321 @@
+"""
+HTTP server converting WAV files with a pool of warm worker processes.
+
+This avoids paying the cost of starting the interpreter, importing numpy and
+setting up the DFT for each conversion. Requests are:
+
+    POST /convert?writer=midi&filters=weed_out_short_notes,absorb_short_notes
+
+with the WAV file as body, or with a `path` parameter giving the name of a
+WAV file readable by the server (and an empty body). The response contains
+the output of the writer.
+
+    GET /stats
+
+returns a JSON object with the number of requests in progress and waiting
+for a worker, and percentiles of the latency of the last requests.
+
+The server does not do any authentication, and should only listen on a
+local address or socket.
+"""
+
+import argparse
+import collections
+import io
+import json
+import multiprocessing
+import os
+import stat
+import sys
+import threading
+import time
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn, UnixStreamServer
+    from urllib.parse import parse_qs, urlparse
+except ImportError:  # Python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn, UnixStreamServer
+    from urlparse import parse_qs, urlparse
+
+import numpy as np
+
+from . import filters, writers
+from .gazouilli import (
+    REFERENCE_FRAMERATE, Gazouilli, GazouilliException, WaveReader,
+    get_writer_options)
+from .utils import LATENCY_HISTORY, percentile
+from .writers import VALID_WRITERS
+
+
+CONTENT_TYPES = {
+    'binary': 'application/octet-stream',
+    'json': 'application/json',
+    'midi': 'audio/midi',
+}
+
+
+class ConversionService(object):
+    """Pool of worker processes converting WAV files, keeping statistics
+    about the conversions.
+    """
+
+    def __init__(self, workers=None, window_size=2**12):
+        """
+        `workers` is the number of worker processes (if None, one per CPU).
+
+        `window_size` is the window size used by the workers' `WaveReader`.
+        The DFT for windows of this size is set up when the workers start.
+        """
+        self.workers = workers or multiprocessing.cpu_count()
+        self.window_size = window_size
+        self.pool = multiprocessing.Pool(
+            self.workers, initializer=_init_worker, initargs=(window_size,))
+
+        self.lock = threading.Lock()
+        self.in_progress = 0
+        self.num_requests = 0
+        self.num_errors = 0
+        self.latencies = collections.deque(maxlen=LATENCY_HISTORY)
+
+    def convert(self, source, writer, filters_names):
+        """Convert `source` (a pair `(kind, value)` where `kind` is either
+        'path' or 'data', and `value` is respectively the name or the content
+        of a WAV file) with the writer and filters of the given names, and
+        return the output of the writer.
+        """
+        start = time.time()
+        with self.lock:
+            self.in_progress += 1
+            self.num_requests += 1
+
+        try:
+            return self.pool.apply(
+                _convert, (source, writer, filters_names, self.window_size))
+        except Exception:
+            with self.lock:
+                self.num_errors += 1
+            raise
+        finally:
+            with self.lock:
+                self.in_progress -= 1
+                self.latencies.append(time.time() - start)
+
+    def stats(self):
+        """Return a dictionary of statistics about the conversions"""
+        with self.lock:
+            latencies = sorted(self.latencies)
+            in_progress = self.in_progress
+            num_requests, num_errors = self.num_requests, self.num_errors
+
+        return {
+            'workers': self.workers,
+            'in_progress': in_progress,
+            'queue_depth': max(0, in_progress - self.workers),
+            'requests': num_requests,
+            'errors': num_errors,
+            'latency': dict(
+                ('p{}'.format(p), percentile(latencies, p))
+                for p in (50, 90, 99)
+            ),
+        }
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+
+def _init_worker(window_size):
+    # Compute the frequency axis and set up the DFT of windows of the default
+    # size, so that they can be reused by all the conversions.
+    reader = WaveReader(window_size=window_size)
+    reader.get_frequencies(np.zeros(window_size, dtype='<i2'), window_size,
+                           REFERENCE_FRAMERATE)
+
+
+def _convert(source, writer_name, filters_names, window_size):
+    kind, value = source
+    infile = value if kind == 'path' else io.BytesIO(value)
+
+    reader = WaveReader(window_size=window_size)
+    writer = writers.get_writer(writer_name)
+    writer_options = get_writer_options(writer, reader, infile)
+    pairs = reader.read(infile)
+
+    filters_to_use = [getattr(filters, fltr) for fltr in filters_names]
+    output = OutputBuffer()
+    Gazouilli(writer, filters=filters_to_use, stream=output,
+              writer_options=writer_options).convert(pairs, apply_filters=True)
+
+    return output.getvalue()
+
+
+class OutputBuffer(object):
+    """Stream collecting the output of a writer as bytes, whether the writer
+    writes text or bytes.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        elif not isinstance(data, (bytes, bytearray)):
+            data = data.encode('utf-8')
+        self.chunks.append(bytes(data))
+
+    def getvalue(self):
+        return b''.join(self.chunks)
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if urlparse(self.path).path != '/stats':
+            return self.send_error(404)
+
+        stats = json.dumps(self.server.service.stats()).encode('utf-8')
+        self.respond(200, stats, 'application/json')
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/convert':
+            return self.send_error(404)
+
+        params = parse_qs(url.query)
+        writer = params.get('writer', [None])[0]
+        filters_names = [
+            fltr for fltr in params.get('filters', [''])[0].split(',') if fltr]
+
+        if writer not in VALID_WRITERS:
+            return self.respond_error(
+                400, 'Invalid writer specified. Valid choices are: ' +
+                ', '.join(VALID_WRITERS))
+        invalid_filters = set(filters_names) - set(filters.__all__)
+        if invalid_filters:
+            return self.respond_error(
+                400, 'Invalid filters: ' + ', '.join(sorted(invalid_filters)))
+
+        length = int(self.headers.get('Content-Length') or 0)
+        data = self.rfile.read(length)
+        if 'path' in params:
+            source = ('path', params['path'][0])
+        else:
+            source = ('data', data)
+
+        try:
+            output = self.server.service.convert(source, writer, filters_names)
+        except GazouilliException as e:
+            return self.respond_error(400, str(e))
+        except Exception as e:
+            return self.respond_error(500, str(e) or e.__class__.__name__)
+
+        content_type = CONTENT_TYPES.get(writer, 'text/plain')
+        self.respond(200, output, content_type)
+
+    def respond(self, code, body, content_type):
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def respond_error(self, code, message):
+        self.respond(code, (message + '\n').encode('utf-8'), 'text/plain')
+
+    def address_string(self):
+        # The client address is empty for Unix sockets
+        return self.client_address[0] if self.client_address else 'local'
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class ThreadingUnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        UnixStreamServer.server_bind(self)
+        self.server_name, self.server_port = 'localhost', 0
+
+
+def make_server(service, host='127.0.0.1', port=8000, socket_path=None):
+    """Return a server handling requests with the `ConversionService`
+    instance `service`, listening on the Unix socket `socket_path` if it is
+    given, or on the address `host` and `port` otherwise.
+    """
+    if socket_path is not None:
+        remove_stale_socket(socket_path)
+        server = ThreadingUnixHTTPServer(socket_path, RequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), RequestHandler)
+
+    server.service = service
+    return server
+
+
+def remove_stale_socket(path):
+    """Remove the socket left at `path` by a previous server, so that a new
+    one can be bound there. Raise `ValueError` if something else than a
+    socket exists at `path`.
+    """
+    try:
+        mode = os.stat(path).st_mode
+    except OSError:
+        return  # nothing to remove
+    if not stat.S_ISSOCK(mode):
+        raise ValueError('{} exists and is not a socket'.format(path))
+    os.remove(path)
+
+
+def get_arguments():
+    """Create an arguments parser and return the parsed arguments from
+    sys.argv"""
+
+    parser = argparse.ArgumentParser(
+        description='Serve conversions of wave audio files over HTTP.')
+    parser.add_argument(
+        '--host', default='127.0.0.1',
+        help='The address on which the server listens.'
+    )
+    parser.add_argument(
+        '--port', type=int, default=8000,
+        help='The port on which the server listens.'
+    )
+    parser.add_argument(
+        '--socket', metavar='PATH',
+        help='Listen on the Unix socket at PATH instead of a TCP port. A '
+             'socket left at PATH by a previous server is replaced.'
+    )
+    parser.add_argument(
+        '-j', '--workers', type=int, metavar='N',
+        help='Number of worker processes. Defaults to the number of CPUs.'
+    )
+
+    return parser.parse_args()
+
+
+def run():
+
+    args = get_arguments()
+
+    service = ConversionService(args.workers)
+    try:
+        server = make_server(service, args.host, args.port, args.socket)
+    except ValueError as e:
+        service.close()
+        sys.stderr.write('Error: {}\n'.format(e))
+        sys.exit(1)
+
+    sys.stderr.write('Listening on {}\n'.format(
+        args.socket or '{}:{}'.format(args.host, args.port)))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
@@ -1,6 +1,8 @@
 import bisect
 import sys
 
+import numpy as np
+
 
 # Used for 'clamping' frequency to a standard MIDI frequency
 TABLE = [
@@ -21,6 +23,12 @@ TABLE = [
     11175.30, 11839.82, 12543.85, float(sys.maxsize)
 ]
 
+# `TABLE` as an array, for vectorized lookups
+NOTE_TABLE = np.array(TABLE)
+
+# Pitch (in Hz) of the A above middle C used to build `TABLE`
+STANDARD_PITCH = 440.0
+
 
 def clamp(freq):
     """Round the frequency to the nearest MIDI note"""
@@ -32,27 +40,106 @@ def clamp(freq):
         return i
 
 
-# TODO: There must be a way to do this with only one pass and without loading
-# the whole sequence into memory. "What would Haskell do?"
+def quantize(freqs, reference_pitch=STANDARD_PITCH):
+    """Vectorized version of `clamp`: return an array containing the number of
+    the nearest MIDI note of each frequency in the array `freqs`.
+
+    `reference_pitch` is the frequency of the A above middle C (MIDI note 69)
+    in the tuning to be used. With the default value, the result is the same
+    as applying `clamp` to each frequency.
+    """
+    table = NOTE_TABLE
+    if reference_pitch != STANDARD_PITCH:
+        table = table * (reference_pitch / STANDARD_PITCH)
+
+    freqs = np.asarray(freqs, dtype=float)
+    i = np.searchsorted(table, freqs, side='right')
+    left, right = table[i - 1], table[i]
+
+    return np.where((freqs - left) < (right - freqs), i - 1, i)
+
+
+def run_lengths(values):
+    """Return two arrays `(vals, counts)` containing the value and length of
+    each run of consecutive equal values in the 1-D array `values`.
+    """
+    values = np.asarray(values)
+    if len(values) == 0:
+        return values, np.zeros(0, dtype=np.intp)
+
+    changes = np.flatnonzero(values[1:] != values[:-1]) + 1
+    starts = np.concatenate(([0], changes))
+    counts = np.diff(np.append(starts, len(values)))
+
+    return values[starts], counts
+
+
+class RunLengthEncoder(object):
+    """Incremental version of `run_lengths`, for arrays of values that are
+    consecutive parts of a longer sequence.
+
+    The last run of each array is kept open, since it can continue in the
+    next array, and is only returned once it is over (or by `flush`).
+    """
+
+    def __init__(self, value=None, count=0):
+        """`value` and `count` describe the run that is currently open"""
+        self.value = value
+        self.count = count
+
+    def feed(self, values):
+        """Return the list of (value, count) pairs of the runs that are over
+        after the values of the array `values`.
+        """
+        vals, counts = run_lengths(values)
+        if len(vals) == 0:
+            return []
+
+        vals, counts = vals.tolist(), counts.tolist()
+        if self.count and vals[0] == self.value:
+            counts[0] += self.count
+        elif self.count:
+            vals.insert(0, self.value)
+            counts.insert(0, self.count)
+
+        self.value, self.count = vals.pop(), counts.pop()
+        return list(zip(vals, counts))
+
+    def flush(self):
+        """Return the list of (value, count) pairs of the open run, if any"""
+        pairs = [(self.value, self.count)] if self.count else []
+        self.value, self.count = None, 0
+        return pairs
+
+
 def collect_consecutive_values(seq):
     """Given a sequence of values, output a list of pairs (v, n) where v is a
     value and n is the number of consecutive repetitions of that value.
 
+    It is computed over the whole sequence at once with `run_lengths` (see
+    `RunLengthEncoder` for sequences given in parts).
+
     Example:
         >>> collect_consecutive_values([53, 92, 92, 92, 96, 96, 92])
-        [(53,1), (92,3), (96,2), (92,1)]
+        [(53, 1), (92, 3), (96, 2), (92, 1)]
     """
+    if not isinstance(seq, np.ndarray):
+        seq = list(seq)
+
+    vals, counts = run_lengths(seq)
+    return list(zip(vals.tolist(), counts.tolist()))
+
 
-    pairs = []
-    sq = list(seq)
-    while len(sq) > 0:
-        val = sq[0]
-        xs = [x == val for x in sq]
-        if all(xs):
-            count = len(xs)
-        else:
-            count = xs.index(False)
-        pairs.append((val, count))
-        sq = sq[count:]
-
-    return pairs
+# Number of latencies kept to compute their percentiles (by the server and
+# the live reader)
+LATENCY_HISTORY = 1000
+
+
+def percentile(values, p):
+    """Return the `p`-th percentile of the sorted list `values` (using the
+    nearest-rank method), or None if it is empty.
+    """
+    if not values:
+        return None
+    rank = int(np.ceil(p / 100.0 * len(values)))
+    return values[max(rank, 1) - 1]
@@ -0,0 +1,245 @@
+"""
+Reading and decoding of WAV files.
+
+Uncompressed PCM files of 8, 16, 24 or 32 bits and floating point files of
+32 or 64 bits are supported, with any number of channels and any framerate
+(including files in the WAVE_FORMAT_EXTENSIBLE format).
+
+The samples are decoded to the scale of 16-bit samples, so that the
+amplitudes of their DFT (and the silence threshold of `WaveReader`) do not
+depend on the format of the file, and the channels are averaged into one.
+16-bit mono files, which need no decoding, are read as 16-bit integers, and
+other files as 32-bit floats.
+"""
+
+import struct
+import wave
+
+import numpy as np
+
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# Numpy type of a sample of each supported (format, sample width) pair.
+# 24-bit samples have no numpy type, and are decoded from their bytes.
+SAMPLE_TYPES = {
+    (WAVE_FORMAT_PCM, 1): np.dtype('u1'),
+    (WAVE_FORMAT_PCM, 2): np.dtype('<i2'),
+    (WAVE_FORMAT_PCM, 3): np.dtype('u1'),
+    (WAVE_FORMAT_PCM, 4): np.dtype('<i4'),
+    (WAVE_FORMAT_IEEE_FLOAT, 4): np.dtype('<f4'),
+    (WAVE_FORMAT_IEEE_FLOAT, 8): np.dtype('<f8'),
+}
+
+# Factor converting samples of each format to the scale of 16-bit samples
+SCALES = {
+    (WAVE_FORMAT_PCM, 1): 256.0,
+    (WAVE_FORMAT_PCM, 2): 1.0,
+    (WAVE_FORMAT_PCM, 3): 1 / 256.0,
+    (WAVE_FORMAT_PCM, 4): 1 / 65536.0,
+    (WAVE_FORMAT_IEEE_FLOAT, 4): 32768.0,
+    (WAVE_FORMAT_IEEE_FLOAT, 8): 32768.0,
+}
+
+# Number of frames decoded at a time when decoding a whole array, so that
+# the temporary arrays of the decoding stay small
+DECODE_CHUNK_SIZE = 2**20
+
+
+class SampleFormat(object):
+    """Format of the samples of a WAV file, as given by its "fmt " chunk"""
+
+    def __init__(self, format_tag, nchannels, framerate, sampwidth):
+        self.format_tag = format_tag
+        self.nchannels = nchannels
+        self.framerate = framerate
+        self.sampwidth = sampwidth
+
+    @property
+    def frame_size(self):
+        return self.nchannels * self.sampwidth
+
+    @property
+    def is_native(self):
+        """Whether the samples are 16-bit mono, which need no decoding"""
+        return (self.format_tag == WAVE_FORMAT_PCM and
+                self.sampwidth == 2 and self.nchannels == 1)
+
+    def frame_shape(self):
+        """Return the shape of the array of samples of a frame"""
+        if self.sampwidth == 3:
+            return (self.nchannels, 3)
+        return (self.nchannels,)
+
+    @property
+    def sample_type(self):
+        return SAMPLE_TYPES[self.format_tag, self.sampwidth]
+
+    def frames(self, data):
+        """Return the complete frames of the bytes `data` as an array, without
+        any copy.
+        """
+        num_frames = len(data) // self.frame_size
+        samples = np.frombuffer(
+            data, dtype=self.sample_type,
+            count=num_frames * self.frame_size // self.sample_type.itemsize)
+        return samples.reshape((num_frames,) + self.frame_shape())
+
+    def decode(self, frames):
+        """Return the array of mono samples (in the scale of 16-bit samples)
+        of the array of frames `frames`.
+        """
+        if self.is_native:
+            return frames.reshape(len(frames))
+
+        key = (self.format_tag, self.sampwidth)
+        if self.sampwidth == 3:
+            # Little-endian signed 24-bit integers, sign-extended by reading
+            # their most significant byte as signed
+            samples = (frames[..., 0].astype('<i4') |
+                       (frames[..., 1].astype('<i4') << 8) |
+                       (frames[..., 2].view('i1').astype('<i4') << 16))
+        elif self.sampwidth == 1:
+            # 8-bit samples are unsigned
+            samples = frames.astype(np.float32) - 128
+        else:
+            samples = frames
+
+        if self.nchannels == 1:
+            samples = samples.reshape(len(samples)).astype(np.float32)
+        else:
+            samples = samples.mean(axis=1, dtype=np.float32)
+
+        samples *= np.float32(SCALES[key])
+        return samples
+
+
+class DecodedSamples(object):
+    """Array-like sequence of the decoded samples of an array of frames,
+    which are only decoded when they are accessed: slices return an array of
+    decoded samples, and `np.asarray` decodes all of them.
+    """
+
+    def __init__(self, frames, sample_format):
+        self.frames = frames
+        self.format = sample_format
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            raise TypeError('DecodedSamples can only be sliced')
+        return self.format.decode(self.frames[index])
+
+    def __array__(self, dtype=None, copy=None):
+        samples = np.empty(len(self), dtype=np.float32)
+        for low in range(0, len(self), DECODE_CHUNK_SIZE):
+            high = low + DECODE_CHUNK_SIZE
+            samples[low:high] = self[low:high]
+        return samples if dtype is None else samples.astype(dtype)
+
+
+class WaveFile(object):
+    """Reader of the samples of a WAV file. It has the same interface as the
+    readers returned by `wave.open` (for the methods used by gazouilli), and
+    a `read_samples` method returning decoded samples.
+    """
+
+    def __init__(self, infile):
+        """`infile` is either a filename or a binary file object"""
+        if hasattr(infile, 'read'):
+            self.file, self.owned = infile, False
+        else:
+            self.file, self.owned = open(infile, 'rb'), True
+
+        try:
+            self.format, self.data_offset, self.data_size = read_header(
+                self.file)
+        except Exception:
+            self.close()
+            raise
+
+        self.nframes = self.data_size // self.format.frame_size
+        self.position = 0
+
+    def getnchannels(self):
+        return self.format.nchannels
+
+    def getsampwidth(self):
+        return self.format.sampwidth
+
+    def getframerate(self):
+        return self.format.framerate
+
+    def getnframes(self):
+        return self.nframes
+
+    def readframes(self, n):
+        """Return the bytes of at most `n` frames"""
+        n = max(0, min(n, self.nframes - self.position))
+        data = self.file.read(n * self.format.frame_size)
+        self.position += len(data) // self.format.frame_size
+        return data
+
+    def read_samples(self, n):
+        """Return the array of the decoded samples of at most `n` frames"""
+        return self.format.decode(self.format.frames(self.readframes(n)))
+
+    def close(self):
+        if self.owned:
+            self.file.close()
+
+
+def read_header(f):
+    """Read the headers of the WAV file `f` up to the start of its data, and
+    return a triple `(sample_format, data_offset, data_size)`.
+
+    Raise `wave.Error` if `f` is not a WAV file.
+    """
+    header = f.read(12)
+    if len(header) < 12:
+        raise wave.Error('file does not start with RIFF id')
+    riff, _, wave_id = struct.unpack('<4sI4s', header)
+    if riff != b'RIFF' or wave_id != b'WAVE':
+        raise wave.Error('file does not start with RIFF id')
+
+    offset = 12
+    sample_format = None
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            raise wave.Error('data chunk missing')
+        chunk_id, size = struct.unpack('<4sI', header)
+        offset += 8
+
+        if chunk_id == b'data':
+            if sample_format is None:
+                raise wave.Error('data chunk before fmt chunk')
+            return sample_format, offset, size
+
+        chunk = f.read(size + (size & 1))  # chunks are padded to even sizes
+        offset += len(chunk)
+        if chunk_id == b'fmt ':
+            sample_format = parse_format(chunk[:size])
+
+
+def parse_format(chunk):
+    """Return the `SampleFormat` of the content of a "fmt " chunk"""
+    if len(chunk) < 16:
+        raise wave.Error('fmt chunk is too short')
+    format_tag, nchannels, framerate, _, _, bits = struct.unpack(
+        '<HHIIHH', chunk[:16])
+    if nchannels < 1:
+        raise wave.Error('bad # of channels')
+    if bits < 1:
+        raise wave.Error('bad sample width')
+
+    if format_tag == WAVE_FORMAT_EXTENSIBLE and len(chunk) >= 26:
+        # The actual format is given by the first two bytes of the GUID of
+        # the sub-format
+        format_tag, = struct.unpack('<H', chunk[24:26])
+
+    return SampleFormat(format_tag, nchannels, framerate, (bits + 7) // 8)
@@ -1,6 +1,53 @@
-from .debug import Debug
-from .floppy import Floppy
-from .json import Json
-from .midi import Midi
+"""
+Writers converting (note, duration) pairs to other formats.
 
-__all__ = ['Debug', 'Floppy', 'Json', 'Midi']
+The module of a writer is only imported when the writer is first used
+(through `get_writer` or as an attribute of this package), so that the
+writers that are not used cost nothing at startup.
+"""
+
+import importlib
+import sys
+
+__all__ = ['Binary', 'Debug', 'Floppy', 'Json', 'Midi']
+
+# Names of the writers used by the command line and the server
+VALID_WRITERS = [w.lower() for w in __all__]
+
+# Module defining each writer of `__all__`
+MODULES = {
+    'Binary': 'binary',
+    'Debug': 'debug',
+    'Floppy': 'floppy',
+    'Json': 'json',
+    'Midi': 'midi',
+}
+
+
+def get_writer(name):
+    """Return the writer class of the given name, either its class name
+    (e.g. 'Midi') or the name used by the command line (e.g. 'midi').
+
+    Raise `ValueError` if there is no such writer.
+    """
+    class_name = name.capitalize()
+    if class_name not in MODULES:
+        raise ValueError('Unknown writer: {}'.format(name))
+    module = importlib.import_module('.' + MODULES[class_name], __name__)
+    return getattr(module, class_name)
+
+
+def __getattr__(name):
+    # Resolve `writers.Midi` and `from .writers import Midi` lazily (on
+    # Python 3.7 and later)
+    if name in MODULES:
+        return get_writer(name)
+    raise AttributeError(
+        'module {!r} has no attribute {!r}'.format(__name__, name))
+
+
+if sys.version_info < (3, 7):
+    # Module attributes cannot be resolved lazily
+    for _name in __all__:
+        globals()[_name] = get_writer(_name)
+    del _name
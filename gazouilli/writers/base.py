@@ -1,12 +1,52 @@
 class BaseWriter(object):
-    """Base writer interface to be extended by other writers"""
+    """Base writer interface to be extended by other writers.
 
-    def __init__(self, pairs, *args, **kwargs):
+    A writer can either be given all the pairs when it is created, and write
+    them at once with `write`, or be used incrementally: `begin` is called
+    with the output stream, then `feed` with the pairs as they become
+    available (possibly many times), and finally `finish`.
+    """
+
+    # Whether the writer writes bytes (instead of text) to its stream
+    binary = False
+
+    def __init__(self, pairs=(), *args, **kwargs):
         self.pairs = pairs
 
     def write(self, fp):
+        self.begin(fp)
+        self.feed(self.pairs)
+        self.finish()
+
+    def begin(self, fp):
+        """Start writing to the stream `fp`"""
+        self.fp = fp
+
+    def feed(self, pairs):
+        """Write the (note, duration) pairs of the iterable `pairs`, which
+        follow the ones given in previous calls.
+        """
         raise NotImplementedError
 
+    def finish(self):
+        """Write what is left once all the pairs have been given to `feed`"""
+        pass
+
     @staticmethod
     def get_output_filename(infile):
         raise NotImplementedError
+
+
+def is_seekable(fp):
+    """Return whether it is possible to go back to a previous position of
+    the stream `fp`.
+    """
+    try:
+        return fp.seekable()
+    except AttributeError:
+        # Python 2 file objects, or streams that can only be written to
+        try:
+            fp.tell()
+        except (IOError, OSError, AttributeError):
+            return False
+        return True
@@ -0,0 +1,241 @@
+"""
+Compact binary format for note sequences, meant to be loaded quickly by other
+programs.
+
+A file starts with a header of `HEADER.size` bytes (all the numbers are
+little-endian):
+
+    magic        4 bytes   b'GZNS'
+    version      uint8     `VERSION`
+    durations    uint8     0: float32 seconds, 1: varint numbers of hops
+    compression  uint8     0: none, 1: zlib
+    reserved     uint8
+    framerate    uint32    framerate of the analysed file
+    window_size  uint32    size of the windows of the analysis (in samples)
+    hop_size     uint32    number of samples between two windows
+    count        uint64    number of notes
+
+followed by the notes (one uint8 each), padded with zeros to a multiple of 4
+bytes, and the durations, either as float32 numbers of seconds or as
+unsigned LEB128 varints counting hops (of `hop_size / framerate` seconds,
+which is the time resolution of the analysis). When the file is compressed,
+everything after the header is a single zlib stream.
+
+Uncompressed files with float32 durations are loaded by `load` (or `loads`)
+without copying any data: the arrays of the returned `NoteSequence` are views
+on the bytes of the file (which is memory-mapped when `load` is given a
+filename).
+"""
+
+import os.path
+import struct
+import zlib
+
+import numpy as np
+
+from ..gazouilli import REFERENCE_FRAMERATE
+from ..notes import NoteSequence
+from .base import BaseWriter
+
+
+MAGIC = b'GZNS'
+VERSION = 1
+
+HEADER = struct.Struct('<4sBBBBIIIQ')
+
+DURATION_ENCODINGS = ['float32', 'varint']
+COMPRESSIONS = [None, 'zlib']
+
+
+class Binary(BaseWriter):
+    """Writer for the compact binary format described in this module"""
+
+    binary = True
+
+    # The CLI and the server give the `framerate`, `window_size` and
+    # `hop_size` of the analysis of the input file to writers with this
+    # attribute (see `gazouilli.get_writer_options`)
+    takes_analysis_parameters = True
+
+    def __init__(self, pairs=(), durations='float32', compression=None,
+                 framerate=REFERENCE_FRAMERATE, window_size=2**12,
+                 hop_size=None):
+        """
+        `durations` is the encoding of the durations: 'float32' (exact for
+        durations of up to a few hours) or 'varint' (durations rounded to a
+        number of hops, usually one or two bytes each).
+
+        `compression` is either None or 'zlib'.
+
+        `framerate`, `window_size` and `hop_size` are the parameters of the
+        analysis the pairs come from, which are written in the header (see
+        `gazouilli.get_writer_options`). The defaults are those of a default
+        `WaveReader` for a file at `REFERENCE_FRAMERATE`. By default,
+        `hop_size` is `window_size`.
+        """
+        if durations not in DURATION_ENCODINGS:
+            raise ValueError('Unknown durations encoding: {}'.format(
+                durations))
+        if compression not in COMPRESSIONS:
+            raise ValueError('Unknown compression: {}'.format(compression))
+
+        self.pairs = pairs
+        self.durations = durations
+        self.compression = compression
+        self.framerate = framerate
+        self.window_size = window_size
+        self.hop_size = hop_size or window_size
+
+    def begin(self, fp):
+        # The notes are all written before the durations, so the pairs are
+        # kept (as arrays of a few bytes per pair) until `finish`.
+        self.fp = fp
+        self.chunks = []
+
+    def feed(self, pairs):
+        if not isinstance(pairs, NoteSequence):
+            pairs = NoteSequence.from_pairs(pairs)
+        if len(pairs):
+            self.chunks.append(pairs)
+
+    def finish(self):
+        if self.chunks:
+            notes = np.concatenate([c.notes for c in self.chunks])
+            durations = np.concatenate([c.durations for c in self.chunks])
+        else:
+            notes, durations = np.zeros(0, np.uint8), np.zeros(0)
+        self.chunks = []
+
+        self.fp.write(HEADER.pack(
+            MAGIC, VERSION, DURATION_ENCODINGS.index(self.durations),
+            COMPRESSIONS.index(self.compression), 0, self.framerate,
+            self.window_size, self.hop_size, len(notes)))
+
+        if self.durations == 'float32':
+            encoded = durations.astype('<f4')
+        else:
+            hops = np.rint(np.asarray(durations, dtype=np.float64) *
+                           (self.framerate / float(self.hop_size)))
+            encoded = encode_varints(hops.astype(np.uint64))
+
+        parts = [notes.tobytes(), b'\0' * (-len(notes) % 4),
+                 encoded.tobytes()]
+        if self.compression == 'zlib':
+            compressor = zlib.compressobj()
+            parts = [compressor.compress(p) for p in parts]
+            parts.append(compressor.flush())
+        for part in parts:
+            self.fp.write(part)
+
+    @staticmethod
+    def get_output_filename(infile):
+        name, ext = os.path.splitext(infile)
+        return name + '.notes'
+
+
+def load(source):
+    """Load a file written by the `Binary` writer, and return a pair
+    `(pairs, parameters)` where `pairs` is a `NoteSequence` (with durations
+    in seconds) and `parameters` a dictionary of the analysis parameters of
+    its header (`framerate`, `window_size` and `hop_size`).
+
+    `source` is either a filename, which is memory-mapped, or a binary file
+    object, which is read entirely.
+
+    Raise `ValueError` if `source` is not a valid file.
+    """
+    if hasattr(source, 'read'):
+        return loads(source.read())
+    return _load(np.memmap(source, dtype=np.uint8, mode='r'))
+
+
+def loads(data):
+    """Same as `load`, for the content of a file given as a bytes-like
+    object (whose memory is shared by the returned arrays).
+    """
+    return _load(np.frombuffer(data, dtype=np.uint8))
+
+
+def _load(data):
+    if len(data) < HEADER.size:
+        raise ValueError('Not a binary notes file: too short')
+    (magic, version, encoding, compression, _, framerate, window_size,
+     hop_size, count) = HEADER.unpack(data[:HEADER.size].tobytes())
+    if magic != MAGIC:
+        raise ValueError('Not a binary notes file: bad magic number')
+    if (version != VERSION or encoding >= len(DURATION_ENCODINGS) or
+            compression >= len(COMPRESSIONS)):
+        raise ValueError('Unsupported binary notes file version or encoding')
+
+    body = data[HEADER.size:]
+    if COMPRESSIONS[compression] == 'zlib':
+        try:
+            body = np.frombuffer(zlib.decompress(body.tobytes()),
+                                 dtype=np.uint8)
+        except zlib.error as e:
+            raise ValueError('Invalid compressed data: {}'.format(e))
+
+    durations_offset = count + (-count % 4)
+    if DURATION_ENCODINGS[encoding] == 'float32':
+        size = durations_offset + 4 * count
+    else:
+        size = durations_offset + count
+    if len(body) < size:
+        raise ValueError('Truncated binary notes file')
+
+    notes = body[:count]
+    if DURATION_ENCODINGS[encoding] == 'float32':
+        durations = body[durations_offset:size].view('<f4')
+    else:
+        hops = decode_varints(body[durations_offset:], count)
+        durations = hops * (hop_size / float(framerate))
+
+    parameters = {
+        'framerate': framerate,
+        'window_size': window_size,
+        'hop_size': hop_size,
+    }
+    return NoteSequence(notes, durations), parameters
+
+
+def encode_varints(values):
+    """Return the array of bytes of the unsigned LEB128 encoding of each
+    integer of the array `values`: 7 bits per byte, least significant first,
+    with the high bit set on all the bytes of a value but the last.
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    lengths = np.ones(len(values), dtype=np.intp)
+    rest = values >> np.uint64(7)
+    while rest.any():
+        lengths += rest > 0
+        rest >>= np.uint64(7)
+
+    offsets = np.cumsum(lengths) - lengths
+    encoded = np.empty(lengths.sum(), dtype=np.uint8)
+    for k in range(lengths.max() if len(values) else 0):
+        selected = lengths > k
+        payload = (values[selected] >> np.uint64(7 * k)) & np.uint64(0x7f)
+        more = (lengths[selected] > k + 1).astype(np.uint64) << np.uint64(7)
+        encoded[offsets[selected] + k] = payload | more
+    return encoded
+
+
+def decode_varints(data, count):
+    """Return the array of the first `count` integers encoded as unsigned
+    LEB128 varints by `encode_varints` in the array of bytes `data`.
+
+    Raise `ValueError` if `data` contains fewer than `count` varints.
+    """
+    ends = np.flatnonzero(data < 0x80)[:count]
+    if len(ends) < count:
+        raise ValueError('Truncated binary notes file')
+    if not count:
+        return np.zeros(0, dtype=np.uint64)
+
+    data = data[:ends[-1] + 1]
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    # Position of each byte in its varint
+    positions = np.arange(len(data)) - np.repeat(starts, ends - starts + 1)
+    shifted = ((data & 0x7f).astype(np.uint64) <<
+               (7 * positions).astype(np.uint64))
+    return np.add.reduceat(shifted, starts)
@@ -1,11 +1,26 @@
-from pprint import PrettyPrinter
+from pprint import pformat
 
+from ..notes import NoteSequence
 from .base import BaseWriter
 
 
 class Debug(BaseWriter):
-    """Writer that output a pretty-printed representation of the input pairs"""
+    """Writer that output a pretty-printed representation of the input pairs,
+    one pair per line.
+    """
 
-    def write(self, fp):
-        pp = PrettyPrinter(stream=fp)
-        pp.pprint(self.pairs)
+    def begin(self, fp):
+        self.fp = fp
+        self.separator = ''
+        fp.write('[')
+
+    def feed(self, pairs):
+        if isinstance(pairs, NoteSequence):
+            pairs = pairs.tolist()
+
+        for pair in pairs:
+            self.fp.write(self.separator + pformat(pair))
+            self.separator = ',\n '
+
+    def finish(self):
+        self.fp.write(']\n')
@@ -1,45 +1,91 @@
 import os.path
 
+from ..gazouilli import GazouilliException
+from ..notes import NoteSequence
 from .base import BaseWriter
 
 
+# Largest number of notes of a track, whose length and the length of the song
+# (three bytes per note and five bytes of header) must fit in two bytes
+MAX_NOTES = (0xFFFF - 5) // 3
+
+# Longest duration (in milliseconds) of a note of a track. Longer notes and
+# rests are split into several notes of the same pitch.
+MAX_DURATION = 0xFFFF
+
+
 class Floppy(BaseWriter):
     """Writer for Flopkestra bytecode file format"""
 
-    def __init__(self, pairs, song_name='song'):
+    def __init__(self, pairs=(), song_name='song'):
         """Build a representation of the music data from a list of pairs
         (n, d) where n is a MIDI note and d a duration in seconds.
         """
+        self.pairs = pairs
         self.song_name = song_name
-        self.track = [(n, int(d * 1000)) for n, d in pairs]
 
-    def write(self, fp):
-        fp.write('const byte {}[] PROGMEM = {{\n'.format(self.song_name))
+    def begin(self, fp):
+        # The lengths at the start of the output are not known until all the
+        # pairs have been given, and their width depends on their value, so
+        # the notes are kept until `finish`. There are at most `MAX_NOTES` of
+        # them (about 500 KB once formatted).
+        self.fp = fp
+        self.notes = []
 
-        # write length of song
-        fp.write(to_hex(len(self.track) * 3 + 5))
-
-        # write number of tracks
-        fp.write(', 0x1, ')
+        fp.write('const byte {}[] PROGMEM = {{\n'.format(self.song_name))
 
-        # write length of track
-        fp.write(to_hex(len(self.track)))
+    def feed(self, pairs):
+        for note, duration in get_track(pairs):
+            while True:
+                if len(self.notes) == MAX_NOTES:
+                    raise GazouilliException(
+                        'A Flopkestra track cannot have more than {} '
+                        'notes'.format(MAX_NOTES))
+                part = min(duration, MAX_DURATION)
+                self.notes.append(', {}, {}'.format(hex(note), to_hex(part)))
+                duration -= part
+                if duration <= 0:
+                    break
 
-        # write notes and durations
-        for note, duration in self.track:
-            fp.write(', {}, {}'.format(hex(note), to_hex(duration)))
+    def finish(self):
+        fp = self.fp
+        fp.write(self.format_lengths(len(self.notes)))
+        fp.write(''.join(self.notes))
         fp.write('\n}\n')
 
+    @staticmethod
+    def format_lengths(length):
+        """Return the length of the song, number of tracks and length of the
+        track for a track of `length` notes.
+        """
+        return '{}, 0x1, {}'.format(to_hex(length * 3 + 5), to_hex(length))
+
     @staticmethod
     def get_output_filename(infile):
         name, ext = os.path.splitext(infile)
         return name + '.floppy'
 
 
+def get_track(pairs):
+    """Return an iterable of the (note, duration) pairs of `pairs` with the
+    durations converted to milliseconds.
+    """
+    if isinstance(pairs, NoteSequence):
+        durations = (pairs.durations * 1000).astype(int)
+        return zip(pairs.notes.tolist(), durations.tolist())
+    return ((n, int(d * 1000)) for n, d in pairs)
+
+
 def to_hex(value):
     """Convert the given integer value into a two byte string
     representation suitable for flopkestra bytecode file format.
+
+    Raise `ValueError` if the value does not fit in two bytes.
     """
+    if not 0 <= value <= 0xFFFF:
+        raise ValueError(
+            'Value {} cannot be encoded in two bytes'.format(value))
+
     high_byte = hex((0xFF00 & value) >> 8)
     low_byte = hex(0xFF & value)
     return '{}, {}'.format(high_byte, low_byte)
@@ -3,14 +3,33 @@ from __future__ import absolute_import
 import json
 import os.path
 
+from ..notes import NoteSequence
 from .base import BaseWriter
 
 
 class Json(BaseWriter):
     """Writer that output a JSON representation of the input pairs"""
 
-    def write(self, fp):
-        json.dump(self.pairs, fp)
+    def begin(self, fp):
+        self.fp = fp
+        self.separator = ''
+        fp.write('[')
+
+    def feed(self, pairs):
+        # Each chunk of pairs is written as the items of a JSON list, without
+        # the enclosing brackets, so that the output is the same as if all
+        # the pairs were dumped together.
+        if isinstance(pairs, NoteSequence):
+            chunks = [pairs.tolist()] if len(pairs) else []
+        else:
+            chunks = ([pair] for pair in pairs)
+
+        for chunk in chunks:
+            self.fp.write(self.separator + json.dumps(chunk)[1:-1])
+            self.separator = ', '
+
+    def finish(self):
+        self.fp.write(']')
 
     @staticmethod
     def get_output_filename(infile):
@@ -1,17 +1,18 @@
 # -*- coding: utf-8
 
-import array
-import io
 import os.path
 import struct
 
-from .base import BaseWriter
+from ..notes import NoteSequence
+from .base import BaseWriter, is_seekable
 
 
 class Midi(BaseWriter):
     """Writer for MIDI file format"""
 
-    def __init__(self, pairs, division=96, tempo=500000, velocity=127,
+    binary = True
+
+    def __init__(self, pairs=(), division=96, tempo=500000, velocity=127,
                  normalize_note_length=False):
         """Build a representation of the MIDI data from a list of pairs
         (n, d) where n is a MIDI note and d a duration in seconds.
@@ -26,76 +27,201 @@ class Midi(BaseWriter):
         If `normalize_note_length` is True, then each note duration will be
         rounded to the nearest multiple of a sixteenth note.
         """
-        self.track = []
         self.division = division
         self.tempo = tempo
         self.velocity = velocity
+        self.normalize_note_length = normalize_note_length
+
+        self.track = list(self.get_events(strip_trailing_silence(pairs)))
 
+    def get_events(self, pairs):
+        """Return an iterable of the (delta-time, event, note) triples of the
+        note on and note off events of the notes in `pairs`.
+        """
         note_on = 0x90
         note_off = 0x80
-        cleaned_pairs = strip_trailing_silence(pairs)
 
-        for note, duration in cleaned_pairs:
-            length_in_ticks = int(duration * self.division * (1e6 / self.tempo))
-            if normalize_note_length:
+        if isinstance(pairs, NoteSequence):
+            ticks = (pairs.durations * self.division *
+                     (1e6 / self.tempo)).astype(int)
+            notes_and_ticks = zip(pairs.notes.tolist(), ticks.tolist())
+        else:
+            notes_and_ticks = (
+                (note, int(duration * self.division * (1e6 / self.tempo)))
+                for note, duration in pairs
+            )
+
+        for note, length_in_ticks in notes_and_ticks:
+            if self.normalize_note_length:
                 length_in_ticks = round_to_closest_sixteenth_note(
                     length_in_ticks, self.division)
-            self.track.append((0, note_on, note))
-            self.track.append((length_in_ticks, note_off, note))
+            yield (0, note_on, note)
+            yield (length_in_ticks, note_off, note)
 
     def write(self, fp):
+        """Write the MIDI file to the binary file object `fp`"""
+
+        # The track is encoded first, since we need to know its length (in
+        # bytes) to write the track header section.
+        track = encode_track(self.track, self.tempo, self.velocity)
+
+        write_header(fp, self.division)
+        fp.write(struct.pack('>i', len(track)))
+        fp.write(track)
+
+    def begin(self, fp):
+        # The length of the track is not known until all the pairs have been
+        # given, so a placeholder is written instead, and overwritten by
+        # `finish`. If the stream is not seekable, the track is kept in memory
+        # until `finish` instead.
+        self.fp = fp
+        self.running_time = 0
+        self.track_length = 0
+        self.buffer = None if is_seekable(fp) else bytearray()
+
+        write_header(fp, self.division)
+        if self.buffer is None:
+            self.length_position = fp.tell()
+            fp.write(struct.pack('>i', 0))
+
+        self.write_track_data(encode_tempo(self.tempo))
+
+    def feed(self, pairs):
+        # Trailing silences do not need to be stripped here, since a silence
+        # is only written as part of the delta-time of the following note.
+        data, self.running_time = encode_events(
+            self.get_events(pairs), self.velocity, self.running_time)
+        self.write_track_data(data)
+
+    def finish(self):
+        self.write_track_data(END_OF_TRACK)
+
+        fp = self.fp
+        if self.buffer is None:
+            end = fp.tell()
+            fp.seek(self.length_position)
+            fp.write(struct.pack('>i', self.track_length))
+            fp.seek(end)
+        else:
+            fp.write(struct.pack('>i', self.track_length))
+            fp.write(self.buffer)
+
+    def write_track_data(self, data):
+        self.track_length += len(data)
+        if self.buffer is None:
+            if str is bytes and isinstance(data, memoryview):
+                # Files opened in text mode (e.g. stdout) only accept
+                # strings on Python 2
+                data = data.tobytes()
+            self.fp.write(data)
+        else:
+            self.buffer.extend(data)
+
+    @staticmethod
+    def get_output_filename(infile):
+        name, ext = os.path.splitext(infile)
+        return name + '.mid'
 
-        # 1. Write track to temporary buffer. This is needed since we need to
-        #    know the length (in bytes) of the track to write the track header
-        #    section, and we cannot know it until we processed all the note
-        #    events.
-        buf = io.StringIO()
 
-        # set tempo event: FF5103 tttttt
-        # tttttt is the tempo (i.e. time in µs per quarter-note)
-        buf.write('\x00')
-        buf.write('\xff\x51\x03')
-        buf.write(get_bytes_for_tempo(self.tempo))
+# Largest delta-time allowed by the MIDI standard, which is encoded with
+# at most 4 bytes.
+MAX_DELTA_TIME = 0x0FFFFFFF
 
-        # note events
-        running_time = 0
-        for time, event, note in self.track:
-            if note == 0:  # silence
-                running_time += time
-                continue
+# Maximum number of bytes of an encoded note event (delta-time, event, note
+# and velocity)
+MAX_EVENT_SIZE = 4 + 3
 
-            buf.write(var_len(time + running_time))
-            buf.write(struct.pack('>BBB', event, note, self.velocity))
 
-            running_time = 0
+# end of track event: FF 2F 00
+END_OF_TRACK = b'\x00\xff\x2f\x00'
 
-        # end of track event: FF 2F 00
-        buf.write('\x00\xff\x2f\x00')
 
-        # 2. Now write the MIDI formatted output to stream
+def write_header(fp, division):
+    """Write the header chunk, and the start of the track chunk up to its
+    length, to the stream `fp`.
+    """
+    # header
+    #  = <type> <header length> <format> <numtrack> <division>
+    fp.write(b'MThd')
+    fp.write(struct.pack('>iHHH', 6, 0, 1, division))
 
-        # header
-        #  = <type> <header length> <format> <numtrack> <division>
-        fp.write('MThd')
-        fp.write(struct.pack('>iHHH', 6, 0, 1, self.division))
+    # track
+    fp.write(b'MTrk')
 
-        # track
-        fp.write('MTrk')
-        fp.write(struct.pack('>i', buf.len))
-        fp.write(buf.getvalue())
 
-        buf.close()
+def encode_tempo(tempo):
+    """Return the encoding of the set tempo event at the start of the track"""
+    # set tempo event: FF5103 tttttt
+    # tttttt is the tempo (i.e. time in µs per quarter-note)
+    return b'\x00\xff\x51\x03' + get_bytes_for_tempo(tempo)
 
-    @staticmethod
-    def get_output_filename(infile):
-        name, ext = os.path.splitext(infile)
-        return name + '.mid'
+
+def encode_track(events, tempo, velocity):
+    """Return the encoded MIDI track data made of the `events`, a list of
+    (delta-time, event, note) triples.
+    """
+    data, _ = encode_events(events, velocity)
+
+    track = bytearray(encode_tempo(tempo))
+    track += data
+    track += END_OF_TRACK
+    return track
+
+
+def encode_events(events, velocity, running_time=0):
+    """Return a pair `(data, running_time)` where `data` is a memoryview of
+    the encoding of the `events`, an iterable of (delta-time, event, note)
+    triples.
+
+    `running_time` is the time elapsed since the last event that was written,
+    because of silences, which is added to the delta-time of the first note.
+    The returned `running_time` is the one to use for the events that follow.
+
+    The events are packed into a single `bytearray` that is preallocated to
+    fit the largest possible encoding of the events (if `events` has a
+    length), or that grows as needed otherwise.
+    """
+    try:
+        buf = bytearray(len(events) * MAX_EVENT_SIZE)
+    except TypeError:
+        buf = bytearray()
+    pos = 0
+
+    for time, event, note in events:
+        if note == 0:  # silence
+            running_time += time
+            continue
+
+        if pos + MAX_EVENT_SIZE > len(buf):
+            buf.extend(bytearray(max(len(buf), 64 * MAX_EVENT_SIZE)))
+
+        # delta-time, with the encoding of values fitting in one or two bytes
+        # inlined since these are by far the most common
+        delta = time + running_time
+        if delta < 0x80:
+            buf[pos] = delta
+            pos += 1
+        elif delta < 0x4000:
+            buf[pos] = 0x80 | (delta >> 7)
+            buf[pos + 1] = delta & 0x7f
+            pos += 2
+        else:
+            pos = write_var_len(buf, pos, delta)
+
+        buf[pos] = event
+        buf[pos + 1] = note
+        buf[pos + 2] = velocity
+        pos += 3
+
+        running_time = 0
+
+    return memoryview(buf)[:pos], running_time
 
 
 def round_to_closest_sixteenth_note(length_in_ticks, division):
-    t = division / 4  # number of ticks per 1/16th note
+    t = division // 4  # number of ticks per 1/16th note
 
-    num_sixteenth_notes = length_in_ticks / t
+    num_sixteenth_notes = length_in_ticks // t
     remainder = length_in_ticks % t
 
     if remainder > t / 2:
@@ -122,24 +248,31 @@ def get_bytes_for_tempo(tempo):
     return struct.pack('>BBB', high_byte, mid_byte, low_byte)
 
 
+def write_var_len(buf, pos, value):
+    """Write the variable length encoding of the input (integer) value as
+    specified by the MIDI standard in the bytearray `buf` at index `pos`, and
+    return the index following the encoded value.
+    """
+    if not 0 <= value <= MAX_DELTA_TIME:
+        raise ValueError(
+            'Value {} cannot be encoded as a MIDI delta-time'.format(value))
+
+    shift = 21
+    while shift and not value >> shift:
+        shift -= 7
+
+    while shift:
+        buf[pos] = 0x80 | ((value >> shift) & 0x7f)
+        pos += 1
+        shift -= 7
+
+    buf[pos] = value & 0x7f
+    return pos + 1
+
+
 def var_len(value):
     """Return the variable length encoding of the input (integer) value
     as specified by the MIDI standard.
     """
-    buf = value & 0x7f
-    value >>= 7
-    while value:
-        buf <<= 8
-        buf |= 0x80
-        buf += value & 0x7f
-        value >>= 7
-
-    a = array.array('B')
-    while True:
-        a.append(buf & 0xFF)
-        if buf & 0x80:
-            buf >>= 8
-        else:
-            break
-
-    return a.tostring()
+    buf = bytearray(4)
+    return bytes(buf[:write_var_len(buf, 0, value)])
@@ -1,8 +1,15 @@
+import ast
 import io
+import re
 from setuptools import setup, find_packages
 
-import gazouilli
 
+# The version and description are read from the source of the package rather
+# than by importing it, which would need its dependencies to be installed
+with io.open('gazouilli/__init__.py', encoding='utf-8') as f:
+    init = f.read()
+version = re.search(r"^__version__ = '([^']+)'", init, re.M).group(1)
+description = ast.get_docstring(ast.parse(init))
 
 with io.open('README.md', encoding='utf-8') as f:
     long_description = f.read()
@@ -10,17 +17,21 @@ with io.open('README.md', encoding='utf-8') as f:
 
 setup(
     name='gazouilli',
-    version=gazouilli.__version__,
+    version=version,
     url='https://github.com/rafikdraoui/gazouilli/',
     author='Rafik Draoui',
     author_email='rafik@rafik.ca',
     license='MIT',
-    description=gazouilli.__doc__,
+    description=description,
     long_description=long_description,
 
     packages=find_packages(),
     install_requires=['numpy'],
     entry_points={
-        'console_scripts': ['gazouilli = gazouilli.cli:run'],
+        'console_scripts': [
+            'gazouilli = gazouilli.cli:run',
+            'gazouilli-server = gazouilli.server:run',
+            'gazouilli-live = gazouilli.realtime:run',
+        ],
     },
 )
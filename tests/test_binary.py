@@ -0,0 +1,71 @@
+import io
+
+import numpy as np
+import pytest
+
+from gazouilli.notes import NoteSequence
+from gazouilli.writers.binary import (
+    Binary, decode_varints, encode_varints, load, loads)
+
+
+HOP_SECONDS = 1024 / 44100.0
+
+
+def random_notes(size, seed=0):
+    rng = np.random.RandomState(seed)
+    return NoteSequence(rng.randint(0, 128, size),
+                        rng.geometric(0.2, size) * HOP_SECONDS)
+
+
+def write(pairs, **options):
+    out = io.BytesIO()
+    Binary(pairs, **options).write(out)
+    return out.getvalue()
+
+
+@pytest.mark.parametrize('durations', ['float32', 'varint'])
+@pytest.mark.parametrize('compression', [None, 'zlib'])
+@pytest.mark.parametrize('size', [0, 1, 3, 1000])
+def test_round_trip(durations, compression, size):
+    pairs = random_notes(size)
+    options = {'durations': durations, 'compression': compression,
+               'framerate': 44100, 'window_size': 4096, 'hop_size': 1024}
+    loaded, parameters = loads(write(pairs, **options))
+
+    assert parameters == {
+        'framerate': 44100, 'window_size': 4096, 'hop_size': 1024}
+    assert np.array_equal(loaded.notes, pairs.notes)
+    assert np.allclose(loaded.durations, pairs.durations)
+
+
+def test_load_file_shares_memory(tmpdir):
+    pairs = random_notes(100)
+    path = str(tmpdir.join('song.notes'))
+    with open(path, 'wb') as f:
+        Binary(pairs).write(f)
+
+    loaded, _ = load(path)
+    assert isinstance(loaded.notes.base, np.memmap) or isinstance(
+        loaded.notes.base.base, np.memmap)
+    assert np.array_equal(loaded.notes, pairs.notes)
+    assert np.allclose(loaded.durations, pairs.durations)
+
+
+@pytest.mark.parametrize('data', [b'', b'GZNS', b'XXXX' + b'\0' * 28])
+def test_invalid_files(data):
+    with pytest.raises(ValueError):
+        loads(data)
+
+
+def test_truncated_file():
+    data = write(random_notes(100))
+    with pytest.raises(ValueError):
+        loads(data[:-1])
+
+
+def test_varints():
+    values = np.array([0, 1, 0x7f, 0x80, 0x3fff, 0x4000, 2**35, 2**63],
+                      dtype=np.uint64)
+    encoded = encode_varints(values)
+    assert encoded[:4].tolist() == [0, 1, 0x7f, 0x80]
+    assert decode_varints(encoded, len(values)).tolist() == values.tolist()
@@ -0,0 +1,86 @@
+import random
+
+import pytest
+
+from gazouilli import filters
+from gazouilli.notes import NoteSequence
+
+
+# The original implementations of the filters
+
+def weed_out_short_notes(pairs, duration_threshold=0.25):
+    return [(n, d) for (n, d) in pairs if d > duration_threshold]
+
+
+def absorb_short_notes(pairs, duration_threshold=0.25):
+    result = []
+    i = 0
+    while i < len(pairs):
+        pair = pairs[i]
+        n, d = pair
+        try:
+            n1, d1 = pairs[i + 1]
+            n2, d2 = pairs[i + 2]
+        except IndexError:
+            if d > duration_threshold:
+                result.append(pair)
+            i += 1
+            continue
+
+        if n == n2 and d1 < duration_threshold:
+            result.append((n, d + d1 + d2))
+            i += 3
+        else:
+            if d > duration_threshold:
+                result.append(pair)
+            i += 1
+
+    return result
+
+
+def convert_duration_to_integer(pairs, ratio=16):
+    return [(n, int(round(d * ratio))) for n, d in pairs]
+
+
+ORIGINALS = [
+    (weed_out_short_notes, 'duration_threshold'),
+    (absorb_short_notes, 'duration_threshold'),
+    (convert_duration_to_integer, 'ratio'),
+]
+
+
+def random_pairs(rng, size):
+    """Return random pairs from a small set of notes and durations, so that
+    there are many ties and (n, short, n) patterns, including overlapping
+    ones.
+    """
+    durations = [0.0, 0.03125, 0.09375, 0.25, 0.5, 1.0]
+    return [
+        (rng.choice([0, 60, 61, 62]),
+         rng.choice(durations) if rng.random() < 0.8 else rng.random() * 2)
+        for _ in range(size)
+    ]
+
+
+@pytest.mark.parametrize('original,option', ORIGINALS,
+                         ids=[fn.__name__ for fn, _ in ORIGINALS])
+def test_filters_match_original(original, option):
+    rng = random.Random(0)
+    fn = getattr(filters, original.__name__)
+    for _ in range(2000):
+        pairs = random_pairs(rng, rng.randint(0, 30))
+        value = rng.choice([0.25, 0.5, 1.0, 16, 3])
+        expected = original(pairs, value)
+
+        assert list(fn(pairs, **{option: value})) == expected
+        assert list(fn(iter(pairs), **{option: value})) == expected
+        assert fn(NoteSequence.from_pairs(pairs), **{option: value}) == (
+            expected)
+
+
+@pytest.mark.parametrize('name', filters.__all__)
+def test_filters_return_lists_for_lists(name):
+    fn = getattr(filters, name)
+    assert isinstance(fn([(60, 0.5), (61, 0.1), (60, 0.5)]), list)
+    assert isinstance(
+        fn(NoteSequence.from_pairs([(60, 0.5), (61, 0.1)])), NoteSequence)
@@ -0,0 +1,107 @@
+import array
+import io
+import struct
+
+import numpy as np
+import pytest
+
+from gazouilli.notes import NoteSequence
+from gazouilli.writers.midi import (
+    MAX_DELTA_TIME, Midi, encode_track, get_bytes_for_tempo, var_len)
+
+
+def original_var_len(value):
+    buf = value & 0x7f
+    value >>= 7
+    while value:
+        buf <<= 8
+        buf |= 0x80
+        buf += value & 0x7f
+        value >>= 7
+
+    a = array.array('B')
+    while True:
+        a.append(buf & 0xFF)
+        if buf & 0x80:
+            buf >>= 8
+        else:
+            break
+
+    return a.tobytes()
+
+
+def original_encode_track(events, tempo, velocity):
+    """The original implementation (using a bytes buffer, since it was
+    broken with `io.StringIO`)
+    """
+    buf = io.BytesIO()
+    buf.write(b'\x00')
+    buf.write(b'\xff\x51\x03')
+    buf.write(get_bytes_for_tempo(tempo))
+
+    running_time = 0
+    for time, event, note in events:
+        if note == 0:
+            running_time += time
+            continue
+
+        buf.write(original_var_len(time + running_time))
+        buf.write(struct.pack('>BBB', event, note, velocity))
+
+        running_time = 0
+
+    buf.write(b'\x00\xff\x2f\x00')
+    return buf.getvalue()
+
+
+def random_pairs(size, seed=0):
+    rng = np.random.RandomState(seed)
+    notes = rng.randint(0, 128, size)
+    durations = rng.exponential(0.5, size)
+    return list(zip(notes.tolist(), durations.tolist()))
+
+
+@pytest.mark.parametrize('value', [
+    0, 1, 0x7f, 0x80, 0x2000, 0x3fff, 0x4000, 0x1fffff, 0x200000,
+    0x8000000, MAX_DELTA_TIME])
+def test_var_len(value):
+    assert var_len(value) == original_var_len(value)
+
+
+def test_var_len_out_of_range():
+    with pytest.raises(ValueError):
+        var_len(MAX_DELTA_TIME + 1)
+    with pytest.raises(ValueError):
+        var_len(-1)
+
+
+def test_encode_track_matches_original():
+    midi = Midi(random_pairs(5000))
+    expected = original_encode_track(midi.track, midi.tempo, midi.velocity)
+    assert bytes(encode_track(midi.track, midi.tempo, midi.velocity)) == (
+        expected)
+
+
+def test_note_sequence_and_list_give_the_same_file():
+    pairs = random_pairs(500, seed=1)
+    outputs = []
+    for source in (pairs, NoteSequence.from_pairs(pairs)):
+        out = io.BytesIO()
+        Midi(source).write(out)
+        outputs.append(out.getvalue())
+    assert outputs[0] == outputs[1]
+
+
+def test_incremental_writing_gives_the_same_file():
+    pairs = random_pairs(500, seed=2)
+    out = io.BytesIO()
+    Midi(pairs).write(out)
+
+    incremental = io.BytesIO()
+    writer = Midi()
+    writer.begin(incremental)
+    for low in range(0, len(pairs), 64):
+        writer.feed(pairs[low:low + 64])
+    writer.finish()
+
+    assert incremental.getvalue() == out.getvalue()
@@ -0,0 +1,75 @@
+import random
+
+import numpy as np
+import pytest
+
+from gazouilli.utils import (
+    TABLE, RunLengthEncoder, clamp, collect_consecutive_values, quantize)
+
+
+def quadratic_collect_consecutive_values(seq):
+    """The original implementation of `collect_consecutive_values`"""
+    pairs = []
+    sq = list(seq)
+    while len(sq) > 0:
+        val = sq[0]
+        xs = [x == val for x in sq]
+        if all(xs):
+            count = len(xs)
+        else:
+            count = xs.index(False)
+        pairs.append((val, count))
+        sq = sq[count:]
+    return pairs
+
+
+def random_values(rng, size):
+    return [rng.choice([0, 60, 61, 62]) for _ in range(size)]
+
+
+def test_quantize_matches_clamp():
+    rng = np.random.RandomState(0)
+    freqs = np.concatenate([
+        rng.uniform(0, 13000, 10000),
+        TABLE[:-1],
+        # Midpoints between notes, where the rounding changes
+        [(a + b) / 2.0 for a, b in zip(TABLE[:-2], TABLE[1:-1])],
+    ])
+    assert quantize(freqs).tolist() == [clamp(f) for f in freqs]
+
+
+def test_quantize_reference_pitch():
+    assert quantize([424.0, 864.0]).tolist() == [68, 81]
+    assert quantize([424.0, 864.0], reference_pitch=432.0).tolist() == [
+        69, 81]
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_collect_consecutive_values(seed):
+    rng = random.Random(seed)
+    values = random_values(rng, rng.randint(0, 50))
+    expected = quadratic_collect_consecutive_values(values)
+    assert collect_consecutive_values(values) == expected
+    assert collect_consecutive_values(np.array(values)) == expected
+
+
+def test_collect_consecutive_values_example():
+    assert collect_consecutive_values([53, 92, 92, 92, 96, 96, 92]) == [
+        (53, 1), (92, 3), (96, 2), (92, 1)]
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_run_length_encoder_in_parts(seed):
+    rng = random.Random(seed)
+    values = random_values(rng, rng.randint(0, 100))
+
+    encoder = RunLengthEncoder()
+    pairs = []
+    low = 0
+    while low < len(values):
+        high = low + rng.randint(0, 10)
+        pairs.extend(encoder.feed(np.array(values[low:high])))
+        low = high
+    pairs.extend(encoder.flush())
+
+    assert pairs == quadratic_collect_consecutive_values(values)
@@ -0,0 +1,97 @@
+import io
+import struct
+
+import numpy as np
+import pytest
+
+from gazouilli.gazouilli import map_samples
+from gazouilli.wavefile import (
+    WAVE_FORMAT_EXTENSIBLE, WAVE_FORMAT_IEEE_FLOAT, WAVE_FORMAT_PCM)
+
+
+# Samples in the scale of 16-bit samples, multiples of 256 so that every
+# format can represent them exactly
+SAMPLES = np.arange(-128, 128, dtype=np.int32) * 256
+
+
+def encode(samples, format_tag, sampwidth):
+    """Return the bytes of the 16-bit scale `samples` in the given format"""
+    if format_tag == WAVE_FORMAT_IEEE_FLOAT:
+        dtype = '<f4' if sampwidth == 4 else '<f8'
+        return (samples / 32768.0).astype(dtype).tobytes()
+    if sampwidth == 1:
+        return (samples // 256 + 128).astype('u1').tobytes()
+    if sampwidth == 3:
+        values = (samples * 256).astype('<i4').view('u1').reshape(-1, 4)
+        return values[:, :3].tobytes()
+    dtype = '<i2' if sampwidth == 2 else '<i4'
+    return (samples * 2**(8 * sampwidth - 16)).astype(dtype).tobytes()
+
+
+def wave_bytes(channels, format_tag=WAVE_FORMAT_PCM, sampwidth=2,
+               framerate=8000, extensible=False):
+    """Return the bytes of a WAV file with the 16-bit scale samples of each
+    of `channels`.
+    """
+    frames = np.stack(channels, axis=1).reshape(-1)
+    data = encode(frames, format_tag, sampwidth)
+    nchannels = len(channels)
+    fmt = struct.pack(
+        '<HHIIHH', WAVE_FORMAT_EXTENSIBLE if extensible else format_tag,
+        nchannels, framerate, framerate * nchannels * sampwidth,
+        nchannels * sampwidth, 8 * sampwidth)
+    if extensible:
+        fmt += struct.pack('<HHIH14s', 22, 8 * sampwidth, 0, format_tag,
+                           b'\0' * 14)
+    chunks = (b'fmt ' + struct.pack('<I', len(fmt)) + fmt +
+              b'data' + struct.pack('<I', len(data)) + data)
+    return b'RIFF' + struct.pack('<I', 4 + len(chunks)) + b'WAVE' + chunks
+
+
+FORMATS = [
+    (WAVE_FORMAT_PCM, 1),
+    (WAVE_FORMAT_PCM, 2),
+    (WAVE_FORMAT_PCM, 3),
+    (WAVE_FORMAT_PCM, 4),
+    (WAVE_FORMAT_IEEE_FLOAT, 4),
+    (WAVE_FORMAT_IEEE_FLOAT, 8),
+]
+
+
+@pytest.mark.parametrize('format_tag,sampwidth', FORMATS)
+@pytest.mark.parametrize('extensible', [False, True])
+def test_formats(format_tag, sampwidth, extensible):
+    data = wave_bytes([SAMPLES], format_tag, sampwidth,
+                      extensible=extensible)
+    samples, framerate = map_samples(io.BytesIO(data))
+    assert framerate == 8000
+    assert np.array_equal(np.asarray(samples), SAMPLES)
+
+
+@pytest.mark.parametrize('format_tag,sampwidth', FORMATS)
+def test_channels_are_averaged(format_tag, sampwidth):
+    data = wave_bytes([SAMPLES, SAMPLES[::-1], np.zeros_like(SAMPLES)],
+                      format_tag, sampwidth)
+    samples, _ = map_samples(io.BytesIO(data))
+    expected = (SAMPLES + SAMPLES[::-1]) / 3.0
+    assert np.allclose(np.asarray(samples), expected, atol=1e-2)
+
+
+@pytest.mark.parametrize('format_tag,sampwidth', FORMATS)
+def test_memory_mapped_file(tmpdir, format_tag, sampwidth):
+    path = str(tmpdir.join('sound.wav'))
+    with open(path, 'wb') as f:
+        f.write(wave_bytes([SAMPLES, SAMPLES], format_tag, sampwidth))
+    samples, _ = map_samples(path)
+
+    assert len(samples) == len(SAMPLES)
+    assert np.array_equal(np.asarray(samples[10:20]), SAMPLES[10:20])
+    assert np.array_equal(np.asarray(samples), SAMPLES)
+
+
+def test_empty_file(tmpdir):
+    path = str(tmpdir.join('empty.wav'))
+    with open(path, 'wb') as f:
+        f.write(wave_bytes([SAMPLES[:0]], WAVE_FORMAT_PCM, 3))
+    samples, _ = map_samples(path)
+    assert len(np.asarray(samples)) == 0
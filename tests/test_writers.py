@@ -0,0 +1,40 @@
+import io
+
+import pytest
+
+from gazouilli.gazouilli import GazouilliException, WaveReader
+from gazouilli.notes import NoteSequence
+from gazouilli.writers.floppy import MAX_DURATION, MAX_NOTES, Floppy
+
+
+def write_floppy(pairs):
+    out = io.StringIO()
+    Floppy(pairs).write(out)
+    return out.getvalue()
+
+
+def test_floppy_splits_long_notes():
+    long_note = write_floppy([(60, 150.0)])
+    split = write_floppy([(60, MAX_DURATION / 1000.0),
+                          (60, MAX_DURATION / 1000.0),
+                          (60, (150000 - 2 * MAX_DURATION) / 1000.0)])
+    assert long_note == split
+    assert write_floppy(NoteSequence.from_pairs([(60, 150.0)])) == long_note
+
+
+def test_floppy_too_many_notes():
+    writer = Floppy([(60, 0.1)] * (MAX_NOTES + 1))
+    out = io.StringIO()
+    with pytest.raises(GazouilliException):
+        writer.write(out)
+
+
+@pytest.mark.parametrize('hop_size', [0, -1, 1.5, '512'])
+def test_invalid_hop_size(hop_size):
+    with pytest.raises(ValueError):
+        WaveReader(hop_size=hop_size)
+
+
+def test_default_hop_size():
+    assert WaveReader(window_size=1024).hop_size == 1024
+    assert WaveReader(window_size=1024, hop_size=256).hop_size == 256